@@ -8,21 +8,35 @@ de conteúdo de arquivos compactados.
 """
 
 import asyncio
+import contextlib
+import io
 import os
 import re
 import argparse
 import psycopg2
+import xxhash
 import aiohttp
+import aiofiles
 import mimetypes
 import urllib.parse
 import zipfile
 import uuid
+import sqlite3
+import hashlib
 import logging
-import shutil
+import math
+import multiprocessing
+import struct
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from operator import itemgetter
 from urllib.parse import urlparse
-from psycopg2.extensions import register_adapter, AsIs
+from psycopg2.extras import execute_values
+from psycopg2.pool import ThreadedConnectionPool
+from lxml import etree
 from dotenv import load_dotenv
-from typing import List, Dict, Set, Optional, Any, Tuple
+from typing import List, Dict, Set, Optional, Any, Tuple, Iterable, Iterator
 from crawl4ai import AsyncWebCrawler, CacheMode
 from crawl4ai.deep_crawling import BFSDeepCrawlStrategy
 from crawl4ai.async_configs import BrowserConfig, CrawlerRunConfig
@@ -75,6 +89,9 @@ EMPRESAS = {
     }
 }
 
+# Tabelas válidas (usadas em queries montadas com f-string)
+TABELAS_EMPRESAS = frozenset(cfg["tabela"] for cfg in EMPRESAS.values())
+
 # Extensões e padrões de URL para arquivos que serão baixados
 DOCUMENT_EXTENSIONS = [
     '.pdf', '.docx', '.doc', '.xlsx', '.xls', '.pptx', '.ppt',
@@ -93,13 +110,144 @@ DOCUMENT_PATH_PATTERNS = [
     '/files/', '/attachments/', '/anexos/'
 ]
 
+# Expressões regulares pré-compiladas para o tratamento de URLs
+_RE_DIGIT = re.compile(r'\d')
+_RE_DIGITS = re.compile(r'\d+')
+
+# Nome do arquivo no cabeçalho Content-Disposition
+_RE_CD_FILENAME = re.compile(r'filename=["\'](.*?)["\']')
+
+# Tabelas de decisão de is_document_url/is_definitely_document_url montadas
+# uma única vez: extensões via str.endswith(tuple) e demais padrões via uma
+# regex de alternativas, numa só passada (caminhos e queries já em minúsculas)
+_DOCUMENT_EXT_TUPLE = tuple(DOCUMENT_EXTENSIONS)
+_WEBPAGE_EXT_TUPLE = ('.html', '.htm', '.php', '.asp', '.aspx', '.jsp')
+_RE_DOCUMENT_EXT_IN_NAME = re.compile(
+    '|'.join(re.escape(ext) for ext in DOCUMENT_EXTENSIONS), re.IGNORECASE)
+_RE_DOUBLE_EXT = re.compile(
+    '(' + '|'.join(re.escape(ext) for ext in DOCUMENT_EXTENSIONS) + r')\1', re.IGNORECASE)
+_RE_DOCUMENT_EXT_ANYWHERE = re.compile(
+    '|'.join(re.escape(ext[1:]) for ext in DOCUMENT_EXTENSIONS))
+_RE_DOCUMENT_PATH = re.compile(
+    '|'.join(re.escape(pattern) for pattern in DOCUMENT_PATH_PATTERNS))
+_RE_DOCUMENT_QUERY = re.compile(
+    r'download=|file=|attachment=|document=|arquivo=')
+_RE_DOCUMENT_KEYWORD = re.compile(
+    r'download|document|file|arquivo|edital|formulario|anexo')
+# Pré-filtro de classify_document_url: toda URL aceita por alguma das regras
+# contém ao menos um destes trechos, então as demais podem ser descartadas
+# sem urlparse
+_RE_DOCUMENT_MARKERS = re.compile(
+    '|'.join(re.escape(ext) for ext in DOCUMENT_EXTENSIONS)
+    + r'|download|document|file|arquivo|edital|formulario|anexo|attachment|/storage/',
+    re.IGNORECASE)
+_RE_DEFINITE_DOCUMENT_PATH = re.compile(
+    r'/(?:download|files|docs|documents|documentos|arquivos|anexos|storage)/')
+_RE_DEFINITE_DOCUMENT_QUERY = re.compile(
+    r'download=|file=|doc=|document=|attachment=|filename=')
+# Nomes de tipos de documento no caminho (filtro de URLs do crawler);
+# 'doc', 'xls' e 'ppt' cobrem também docx, xlsx e pptx
+_RE_PATH_DOCUMENT_TYPE = re.compile(r'pdf|doc|xls|ppt|zip')
+
+# Tabela de tradução para sanitize_filename: caracteres inválidos em nomes
+# de arquivo, barras e pontos viram underscore em uma única passada
+_SANITIZE_TABLE = str.maketrans({c: '_' for c in '\\/*?:"<>|.'})
+
+# Tabela para nomes de arquivo de documentos: mesmos caracteres inválidos,
+# mas preservando os pontos (extensão)
+_FILENAME_TABLE = str.maketrans({c: '_' for c in '\\/*?:"<>|'})
+
+# Tipo de arquivo por extensão (get_file_type)
+_EXT_TO_TYPE = {
+    '.pdf': 'pdf',
+    '.docx': 'word', '.doc': 'word',
+    '.xlsx': 'excel', '.xls': 'excel',
+    '.pptx': 'powerpoint', '.ppt': 'powerpoint',
+    '.csv': 'csv',
+    '.zip': 'arquivo_compactado', '.rar': 'arquivo_compactado', '.7z': 'arquivo_compactado',
+    '.gz': 'arquivo_compactado', '.tar': 'arquivo_compactado', '.bz2': 'arquivo_compactado',
+    '.xz': 'arquivo_compactado',
+    '.jpg': 'imagem', '.jpeg': 'imagem', '.png': 'imagem', '.gif': 'imagem',
+    '.bmp': 'imagem', '.svg': 'imagem',
+    '.mp4': 'video', '.avi': 'video', '.mov': 'video', '.wmv': 'video',
+    '.flv': 'video', '.webm': 'video',
+    '.mp3': 'audio', '.wav': 'audio', '.ogg': 'audio', '.flac': 'audio', '.aac': 'audio',
+    '.txt': 'texto',
+    '.html': 'html', '.htm': 'html',
+}
+
+# Tipo de arquivo por trecho do Content-Type, na ordem de prioridade
+# (usado quando o arquivo baixado não tem extensão)
+_MIME_SUBSTR_TYPE = (
+    ('pdf', 'pdf'),
+    ('excel', 'excel'), ('spreadsheet', 'excel'),
+    ('word', 'word'),
+    ('csv', 'csv'),
+    ('powerpoint', 'powerpoint'), ('presentation', 'powerpoint'),
+    ('zip', 'arquivo_compactado'), ('compressed', 'arquivo_compactado'),
+)
+
+# Extensão por tipo MIME; consultada antes do módulo mimetypes, que só lê os
+# arquivos mime.types do sistema quando um tipo não está aqui
+_EXT_BY_MIME = {
+    'application/pdf': '.pdf',
+    'application/msword': '.doc',
+    'application/vnd.openxmlformats-officedocument.wordprocessingml.document': '.docx',
+    'application/vnd.ms-excel': '.xls',
+    'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet': '.xlsx',
+    'application/vnd.ms-powerpoint': '.ppt',
+    'application/vnd.openxmlformats-officedocument.presentationml.presentation': '.pptx',
+    'text/csv': '.csv',
+    'application/zip': '.zip',
+    'application/x-rar-compressed': '.rar',
+    'application/x-7z-compressed': '.7z',
+    'application/gzip': '.gz',
+    'application/x-tar': '.tar',
+    'application/x-bzip2': '.bz2',
+    'application/x-xz': '.xz',
+    'application/vnd.ms-outlook': '.msg',
+    'application/octet-stream': '.bin',
+    'application/xml': '.xml',
+    'application/json': '.json',
+    'image/jpeg': '.jpg',
+    'image/png': '.png',
+    'image/gif': '.gif',
+    'audio/mpeg': '.mp3',
+    'video/mp4': '.mp4',
+    'audio/wav': '.wav',
+}
+
+# Trechos de Content-Type que indicam um documento (checagem por HEAD)
+_RE_DOCUMENT_CONTENT_TYPE = re.compile(
+    r'pdf|msword|document|excel|spreadsheet|powerpoint|presentation|zip|compressed|octet-stream')
+
+# Diretórios do script e do projeto, resolvidos uma única vez
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_DIR = os.path.dirname(SCRIPT_DIR)
+_PROJECT_PREFIX = PROJECT_DIR + os.sep
+
 # Adicionar constante para controle de cache
-CACHE_DIR = os.path.join(os.path.dirname(
-    os.path.dirname(os.path.abspath(__file__))), 'cache')
+CACHE_DIR = os.path.join(PROJECT_DIR, 'cache')
 
 # Adicionar constante para diretório de saída
-OUTPUT_DIR = os.path.join(os.path.dirname(
-    os.path.dirname(os.path.abspath(__file__))), 'output')
+OUTPUT_DIR = os.path.join(PROJECT_DIR, 'output')
+
+
+def get_project_relpath(path: str) -> str:
+    """
+    Retorna o caminho relativo ao diretório do projeto, evitando os.path.relpath
+    (que consulta o diretório corrente) quando o caminho já está sob o projeto.
+
+    Args:
+        path: Caminho absoluto do arquivo
+
+    Returns:
+        Caminho relativo ao diretório do projeto
+    """
+    if path.startswith(_PROJECT_PREFIX):
+        return path[len(_PROJECT_PREFIX):]
+    return os.path.relpath(path, PROJECT_DIR)
+
 
 # Adicionar funções para gerenciar cache
 
@@ -118,85 +266,216 @@ def get_cache_filename(empresa: str) -> str:
     return os.path.join(CACHE_DIR, f"{empresa}_crawled_urls.txt")
 
 
-def load_crawled_urls_from_cache(empresa: str) -> Set[str]:
+def get_document_cache_filename(empresa: str) -> str:
     """
-    Carrega URLs já processadas do cache.
+    Retorna o nome do arquivo de cache para documentos de uma empresa.
 
     Args:
         empresa: Nome da empresa
 
     Returns:
-        Conjunto de URLs já processadas
+        Caminho do arquivo de cache de documentos
     """
-    cache_file = get_cache_filename(empresa)
-    if os.path.exists(cache_file):
-        with open(cache_file, 'r') as f:
-            return set(line.strip() for line in f if line.strip())
-    return set()
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    return os.path.join(CACHE_DIR, f"{empresa}_document_urls.txt")
 
 
-def save_crawled_urls_to_cache(empresa: str, urls: Set[str]) -> None:
+def get_cache_db_filename(empresa: str) -> str:
     """
-    Salva URLs processadas no cache.
+    Retorna o nome do banco SQLite de cache de uma empresa.
 
     Args:
         empresa: Nome da empresa
-        urls: Conjunto de URLs processadas
+
+    Returns:
+        Caminho do banco SQLite de cache
     """
-    cache_file = get_cache_filename(empresa)
-    with open(cache_file, 'w') as f:
-        for url in urls:
-            f.write(f"{url}\n")
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    return os.path.join(CACHE_DIR, f"{empresa}.db")
 
 
-def get_document_cache_filename(empresa: str) -> str:
+class UrlCache:
     """
-    Retorna o nome do arquivo de cache para documentos de uma empresa.
+    Conjunto persistente de URLs já processadas de uma empresa, gravado no
+    banco SQLite de cache. As consultas usam a chave primária e as inserções
+    são incrementais, sem reescrever o arquivo inteiro a cada execução.
+    """
+
+    def __init__(self, empresa: str):
+        """
+        Abre (ou cria) o cache de URLs da empresa, importando os antigos
+        arquivos .txt de cache na primeira execução.
+
+        Args:
+            empresa: Nome da empresa
+        """
+        self.conn = sqlite3.connect(
+            get_cache_db_filename(empresa), isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS urls (
+                url TEXT PRIMARY KEY,
+                tipo TEXT NOT NULL
+            )
+        """)
+        # Arquivos .txt do formato antigo já importados (versionados no git,
+        # por isso não são renomeados nem apagados)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS importados (
+                arquivo TEXT PRIMARY KEY,
+                mtime_ns INTEGER NOT NULL
+            )
+        """)
+        self._import_legacy_file(get_cache_filename(empresa), 'pagina')
+        self._import_legacy_file(
+            get_document_cache_filename(empresa), 'documento')
+
+    def _import_legacy_file(self, cache_file: str, tipo: str) -> None:
+        """
+        Importa um arquivo .txt de cache do formato antigo. O arquivo é mantido
+        no lugar; a importação fica registrada na tabela importados e só se
+        repete se o arquivo for modificado.
+
+        Args:
+            cache_file: Caminho do arquivo .txt com uma URL por linha
+            tipo: Tipo das URLs do arquivo ('pagina' ou 'documento')
+        """
+        try:
+            mtime_ns = os.stat(cache_file).st_mtime_ns
+        except FileNotFoundError:
+            return
+        arquivo = os.path.basename(cache_file)
+        row = self.conn.execute(
+            "SELECT mtime_ns FROM importados WHERE arquivo = ?", (arquivo,)).fetchone()
+        if row is not None and row[0] == mtime_ns:
+            return
+        with open(cache_file, 'r') as f, self.conn:
+            self.conn.execute("BEGIN")
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO urls (url, tipo) VALUES (?, ?)",
+                ((url, tipo) for line in f if (url := line.strip())))
+            self.conn.execute(
+                "INSERT OR REPLACE INTO importados (arquivo, mtime_ns) VALUES (?, ?)",
+                (arquivo, mtime_ns))
+        logger.info(f"Cache {cache_file} importado para o SQLite")
+
+    def add(self, url: str, tipo: str = 'pagina') -> None:
+        """
+        Registra uma URL como processada.
+
+        Args:
+            url: URL processada
+            tipo: Tipo da URL ('pagina' ou 'documento')
+        """
+        self.conn.execute(
+            "INSERT OR IGNORE INTO urls (url, tipo) VALUES (?, ?)", (url, tipo))
+
+    def contains(self, url: str) -> bool:
+        """
+        Verifica se uma URL já foi processada.
+
+        Args:
+            url: URL a ser verificada
+
+        Returns:
+            True se a URL estiver no cache, False caso contrário
+        """
+        return self.conn.execute(
+            "SELECT 1 FROM urls WHERE url = ?", (url,)).fetchone() is not None
+
+    __contains__ = contains
+
+    def all(self, tipo: Optional[str] = None) -> Iterator[str]:
+        """
+        Percorre as URLs do cache sem carregá-las todas em memória.
+
+        Args:
+            tipo: Se informado, retorna apenas URLs desse tipo
+
+        Returns:
+            Gerador com as URLs do cache
+        """
+        if tipo is None:
+            cursor = self.conn.execute("SELECT url FROM urls")
+        else:
+            cursor = self.conn.execute(
+                "SELECT url FROM urls WHERE tipo = ?", (tipo,))
+        for (url,) in cursor:
+            yield url
+
+    def __len__(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM urls").fetchone()[0]
+
+    def close(self) -> None:
+        """Fecha a conexão com o banco de cache."""
+        self.conn.close()
+
+
+def open_document_cache(empresa: str) -> sqlite3.Connection:
+    """
+    Abre o cache de metadados HTTP (ETag/Last-Modified) dos documentos de uma empresa.
 
     Args:
         empresa: Nome da empresa
 
     Returns:
-        Caminho do arquivo de cache de documentos
+        Conexão SQLite com a tabela de documentos criada
     """
-    os.makedirs(CACHE_DIR, exist_ok=True)
-    return os.path.join(CACHE_DIR, f"{empresa}_document_urls.txt")
+    cache_db = sqlite3.connect(get_cache_db_filename(empresa))
+    cache_db.execute("""
+        CREATE TABLE IF NOT EXISTS documentos (
+            url TEXT PRIMARY KEY,
+            etag TEXT,
+            last_modified TEXT,
+            sha256 TEXT,
+            size INTEGER,
+            local_path TEXT
+        )
+    """)
+    return cache_db
 
 
-def load_documents_from_cache(empresa: str) -> Set[str]:
+def get_document_validators(cache_db: sqlite3.Connection, url: str) -> Optional[Tuple[str, str, str, str]]:
     """
-    Carrega URLs de documentos do cache.
+    Obtém os validadores HTTP salvos para um documento.
 
     Args:
-        empresa: Nome da empresa
+        cache_db: Conexão com o cache de documentos
+        url: URL do documento
 
     Returns:
-        Conjunto de URLs de documentos
+        Tupla (etag, last_modified, sha256, caminho_local) ou None se não houver registro
     """
-    cache_file = get_document_cache_filename(empresa)
-    if os.path.exists(cache_file):
-        with open(cache_file, 'r') as f:
-            return set(line.strip() for line in f if line.strip())
-    return set()
+    return cache_db.execute(
+        "SELECT etag, last_modified, sha256, local_path FROM documentos WHERE url = ?", (url,)).fetchone()
 
 
-def save_documents_to_cache(empresa: str, urls: List[str]) -> None:
+def save_document_validators(cache_db: sqlite3.Connection, url: str, etag: Optional[str],
+                             last_modified: Optional[str], sha256: str, size: int, local_path: str) -> None:
     """
-    Salva URLs de documentos no cache.
+    Salva os validadores HTTP e o hash de um documento baixado.
 
     Args:
-        empresa: Nome da empresa
-        urls: Lista de URLs de documentos
+        cache_db: Conexão com o cache de documentos
+        url: URL do documento
+        etag: Cabeçalho ETag da resposta
+        last_modified: Cabeçalho Last-Modified da resposta
+        sha256: Hash SHA-256 do conteúdo
+        size: Tamanho do conteúdo em bytes
+        local_path: Caminho local do arquivo
     """
-    cache_file = get_document_cache_filename(empresa)
-    with open(cache_file, 'w') as f:
-        for url in urls:
-            f.write(f"{url}\n")
+    with cache_db:
+        cache_db.execute(
+            "INSERT OR REPLACE INTO documentos (url, etag, last_modified, sha256, size, local_path) VALUES (?, ?, ?, ?, ?, ?)",
+            (url, etag, last_modified, sha256, size, local_path))
 
 
+@lru_cache(maxsize=None)
 def get_output_dir(empresa: str) -> str:
     """
-    Retorna o diretório de saída para os arquivos da empresa.
+    Retorna o diretório de saída para os arquivos da empresa. Os diretórios
+    de saída são criados uma única vez por execução (resultado memorizado).
 
     Args:
         empresa: Nome da empresa
@@ -209,6 +488,7 @@ def get_output_dir(empresa: str) -> str:
     return output_dir
 
 
+@lru_cache(maxsize=None)
 def get_html_output_dir(empresa: str) -> str:
     """
     Retorna o diretório de saída para arquivos HTML/markdown da empresa.
@@ -224,6 +504,7 @@ def get_html_output_dir(empresa: str) -> str:
     return html_dir
 
 
+@lru_cache(maxsize=None)
 def get_documents_output_dir(empresa: str) -> str:
     """
     Retorna o diretório de saída para documentos da empresa.
@@ -239,6 +520,59 @@ def get_documents_output_dir(empresa: str) -> str:
     return docs_dir
 
 
+# Nomes de arquivo presentes em cada diretório de documentos, listados uma vez
+_DOCS_DIR_CACHE: Dict[str, Set[str]] = {}
+
+# URL dona de cada caminho de documento reservado nesta execução
+_DOC_PATH_OWNERS: Dict[str, str] = {}
+
+
+def get_docs_dir_listing(docs_dir: str) -> Set[str]:
+    """
+    Retorna os nomes de arquivo de um diretório de documentos, listando-o
+    apenas na primeira chamada; os downloads seguintes atualizam o conjunto.
+
+    Args:
+        docs_dir: Diretório de documentos
+
+    Returns:
+        Conjunto (mutável, compartilhado) com os nomes de arquivo do diretório
+    """
+    listing = _DOCS_DIR_CACHE.get(docs_dir)
+    if listing is None:
+        try:
+            listing = set(os.listdir(docs_dir))
+        except FileNotFoundError:
+            listing = set()
+        _DOCS_DIR_CACHE[docs_dir] = listing
+    return listing
+
+
+def reserve_document_path(local_path: str, url: str) -> str:
+    """
+    Reserva o caminho de destino de um documento para a URL durante a
+    execução. Se outra URL já reservou o mesmo caminho (ex.: links
+    download.php?id=...), um sufixo numérico é acrescentado ao nome, para
+    que downloads simultâneos ou sucessivos não gravem o mesmo arquivo.
+
+    Args:
+        local_path: Caminho de destino desejado
+        url: URL do documento
+
+    Returns:
+        Caminho reservado para a URL
+    """
+    stem, ext = os.path.splitext(local_path)
+    candidate = local_path
+    n = 1
+    # Chamada apenas no event loop, então a reserva não precisa de lock
+    while _DOC_PATH_OWNERS.setdefault(candidate, url) != url:
+        candidate = f"{stem}_{n}{ext}"
+        n += 1
+    return candidate
+
+
+@lru_cache(maxsize=None)
 def get_extracted_output_dir(empresa: str) -> str:
     """
     Retorna o diretório de saída para arquivos extraídos de ZIPs da empresa.
@@ -259,6 +593,16 @@ MAX_RETRIES = 3  # Número máximo de tentativas para baixar um documento
 DOWNLOAD_TIMEOUT = 60  # Timeout em segundos para download de documentos
 CONNECT_TIMEOUT = 30  # Timeout para conexão inicial
 GLOBAL_TIMEOUT = 3600  # Timeout global para a sessão completa (1 hora)
+MAX_CONCURRENT_DOWNLOADS = 64  # Downloads de documentos simultâneos por empresa
+MAX_CONCURRENT_EMPRESAS = 4  # Empresas processadas simultaneamente no modo paralelo
+HEAD_CHECK_CONCURRENCY = 32  # Requisições HEAD simultâneas na detecção antecipada
+PAGE_BATCH_SIZE = 100  # Páginas acumuladas antes de cada gravação em lote no banco
+DOCUMENT_BATCH_SIZE = 100  # Documentos baixados acumulados antes de cada commit
+DOWNLOAD_WRITE_BUFFER = 4 * 1024 * 1024  # Bytes acumulados antes de cada escrita em disco
+ZIP_COPY_BUFFER = 1024 * 1024  # Tamanho do bloco ao copiar membros de um ZIP
+RANGED_DOWNLOAD_MIN_SIZE = 32 * 1024 * 1024  # Documentos a partir deste tamanho são baixados em partes
+RANGED_DOWNLOAD_PARTS = 8  # Requisições Range simultâneas por documento grande
+MAX_DUPLICATE_LINKS_REPORTED = 20  # Links duplicados listados no erro do índice único
 
 # =============================================================================
 # FUNÇÕES DE UTILIDADE
@@ -276,23 +620,60 @@ def sanitize_filename(url: str) -> str:
         Nome de arquivo seguro
     """
     # Remover protocolo e www
-    name = re.sub(r'https?://(www\.)?', '', url)
-    # Substituir caracteres não permitidos em nomes de arquivo
-    name = re.sub(r'[\\/*?:"<>|]', '_', name)
-    # Substituir barras e pontos por underscores
-    name = name.replace('/', '_').replace('.', '_')
-    # Limitar o tamanho do nome do arquivo
-    if len(name) > 100:
-        name = name[:100]
-    return name
+    scheme, sep, rest = url.partition('://')
+    if sep and scheme.lower() in ('http', 'https'):
+        url = rest
+    name = url.removeprefix('www.')
+    # Substituir caracteres não permitidos, barras e pontos por underscores
+    # e limitar o tamanho do nome do arquivo
+    return name.translate(_SANITIZE_TABLE)[:100]
+
+
+# Pool de conexões do processo, criado na primeira solicitação
+_db_pool: Optional[ThreadedConnectionPool] = None
+# Serializa a criação do pool, que pode ser pedida por várias threads ao mesmo tempo
+_db_pool_lock = threading.Lock()
+
+# Limites do pool e parâmetros de keepalive TCP das conexões
+DB_POOL_MIN = 1
+DB_POOL_MAX = 8
+DB_KEEPALIVE_OPTIONS = {
+    'keepalives': 1,
+    'keepalives_idle': 30,
+    'keepalives_interval': 10,
+    'keepalives_count': 5,
+}
 
 
-def get_db_connection():
+def get_db_pool() -> ThreadedConnectionPool:
     """
-    Estabelece conexão com o banco de dados usando variáveis de ambiente.
+    Obtém o pool de conexões com o banco de dados, criando-o na primeira chamada
+    a partir das variáveis de ambiente (.env).
 
     Returns:
-        Conexão com o banco de dados PostgreSQL
+        Pool de conexões PostgreSQL compartilhado pelo processo
+
+    Raises:
+        EnvironmentError: Se variáveis de ambiente necessárias não forem encontradas
+    """
+    global _db_pool
+    if _db_pool is not None:
+        return _db_pool
+
+    with _db_pool_lock:
+        # Outra thread pode ter criado o pool enquanto esta aguardava o lock
+        if _db_pool is None:
+            _db_pool = _create_db_pool()
+    return _db_pool
+
+
+def _create_db_pool() -> ThreadedConnectionPool:
+    """
+    Cria o pool de conexões a partir das variáveis de ambiente (.env);
+    chamada por get_db_pool com o lock de criação adquirido.
+
+    Returns:
+        Novo pool de conexões PostgreSQL
 
     Raises:
         EnvironmentError: Se variáveis de ambiente necessárias não forem encontradas
@@ -309,174 +690,811 @@ def get_db_connection():
             f"Certifique-se de criar um arquivo .env baseado no .env.example."
         )
 
-    return psycopg2.connect(
+    return ThreadedConnectionPool(
+        DB_POOL_MIN,
+        DB_POOL_MAX,
         dbname=os.getenv('DB_NAME'),
         user=os.getenv('DB_USER'),
         password=os.getenv('DB_PASSWORD'),
-        host=os.getenv('DB_HOST')
+        host=os.getenv('DB_HOST'),
+        **DB_KEEPALIVE_OPTIONS
     )
 
 
-def extract_subdomain(url: str) -> str:
+def get_db_connection():
     """
-    Extrai o subdomínio de uma URL.
-
-    Args:
-        url: URL da qual extrair o subdomínio
+    Obtém uma conexão do pool; deve ser devolvida com release_db_connection.
 
     Returns:
-        Subdomínio ou string vazia se não encontrado
+        Conexão com o banco de dados PostgreSQL
+
+    Raises:
+        EnvironmentError: Se variáveis de ambiente necessárias não forem encontradas
     """
-    # Remove protocolo se existir
-    url = re.sub(r'https?://', '', url)
-    # Divide por pontos e pega todos menos o último e penúltimo (domínio principal)
-    parts = url.split('.')
-    if len(parts) > 2:
-        return parts[0]
-    return ''
+    return get_db_pool().getconn()
 
 
-def extract_path_tags(url: str) -> List[str]:
+def release_db_connection(conn, close: bool = False) -> None:
     """
-    Extrai tags do caminho da URL.
+    Devolve uma conexão ao pool (transações abertas são desfeitas).
 
     Args:
-        url: URL da qual extrair tags
+        conn: Conexão obtida com get_db_connection
+        close: Se a conexão deve ser fechada em vez de reutilizada (ex.: estado
+            de sessão que não pôde ser limpo)
+    """
+    if _db_pool is not None:
+        _db_pool.putconn(conn, close=close)
+    else:
+        conn.close()
+
+
+def close_db_pool() -> None:
+    """Fecha todas as conexões do pool, se ele tiver sido criado."""
+    global _db_pool
+    with _db_pool_lock:
+        if _db_pool is not None:
+            _db_pool.closeall()
+            _db_pool = None
+
+
+@lru_cache(maxsize=4096)
+def _parse_url_parts(url: str) -> Tuple[str, Tuple[str, ...]]:
+    """
+    Faz o parsing da URL uma única vez, extraindo subdomínio e tags do caminho.
+    O resultado é cacheado, pois a mesma URL passa várias vezes pelos pipelines
+    de páginas, documentos e cache.
+
+    Args:
+        url: URL a ser analisada
 
     Returns:
-        Lista de tags extraídas do caminho
+        Tupla (subdomínio, tags do caminho)
     """
-    # Remove protocolo e domínio
-    path = re.sub(r'https?://[^/]+/', '', url)
-    # Remove parâmetros de query e âncoras
-    path = re.sub(r'[?#].*$', '', path)
+    # Remover esquema, query e âncora com fatiamento simples de string
+    rest = url.partition('://')[2] if '://' in url else url
+    rest = rest.partition('#')[0].partition('?')[0]
+    netloc, _, path = rest.partition('/')
+
+    # Host sem credenciais nem porta; com mais de duas partes, a primeira é o subdomínio
+    host = netloc.rpartition('@')[2].partition(':')[0].lower()
+    host_parts = host.split('.')
+    subdomain = host_parts[0] if len(host_parts) > 2 else ''
+
     # Divide o caminho em partes
     parts = [p for p in path.split('/') if p]
 
     # Lista para armazenar as tags processadas
     processed_tags = []
+    # Indica se já existe uma tag sem dígitos (categoria, ex: 'noticias')
+    has_category = False
 
     # Processa cada parte do caminho
     for part in parts:
         # Se for numérico ou contiver números, pega a parte anterior se existir
-        if re.search(r'\d', part):
-            # Procura a última tag não numérica adicionada
-            previous_parts = [
-                p for p in processed_tags if not re.search(r'\d', p)]
-            if previous_parts:
+        if _RE_DIGIT.search(part):
+            if has_category:
                 continue  # Já temos a tag categoria (ex: 'noticias')
-            else:
-                # Se não houver tag anterior, tenta extrair a parte não numérica
-                non_numeric = re.sub(r'\d+', '', part).strip(',.-_')
-                if non_numeric:
-                    processed_tags.append(non_numeric)
+            # Se não houver tag anterior, tenta extrair a parte não numérica
+            non_numeric = _RE_DIGITS.sub('', part).strip(',.-_')
+            if non_numeric:
+                processed_tags.append(non_numeric)
+                # Sem dígitos após a limpeza, ela passa a valer como categoria
+                has_category = True
         else:
             processed_tags.append(part)
+            has_category = True
+
+    return subdomain, tuple(processed_tags)
+
+
+def extract_subdomain(url: str) -> str:
+    """
+    Extrai o subdomínio de uma URL.
+
+    Args:
+        url: URL da qual extrair o subdomínio
 
-    return processed_tags
+    Returns:
+        Subdomínio ou string vazia se não encontrado
+    """
+    return _parse_url_parts(url)[0]
 
 
-def adapt_list(lst):
+def extract_path_tags(url: str) -> List[str]:
     """
-    Adapta uma lista Python para array PostgreSQL.
+    Extrai tags do caminho da URL.
 
     Args:
-        lst: Lista a ser adaptada
+        url: URL da qual extrair tags
 
     Returns:
-        Representação SQL do array
+        Lista de tags extraídas do caminho
+    """
+    # Retorna uma nova lista, pois os chamadores acrescentam tags a ela
+    return list(_parse_url_parts(url)[1])
+
+
+class UrlBloomFilter:
+    """
+    Filtro de Bloom para URLs: responde "talvez contenha" ou "certamente não
+    contém" usando cerca de 1,8 byte por URL (taxa de falsos positivos de 0,1%),
+    em vez das centenas de bytes de um set de strings.
     """
-    if lst is None:
-        return AsIs('NULL')
-    return AsIs("'{%s}'" % ','.join(str(x) for x in lst))
 
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        """
+        Dimensiona o filtro para a quantidade esperada de URLs.
+
+        Args:
+            capacity: Número esperado de URLs
+            error_rate: Taxa de falsos positivos desejada
+        """
+        capacity = max(capacity, 1)
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, url: str) -> Iterator[int]:
+        # Hash duplo: dois valores de 64 bits de um único xxh3 de 128 bits
+        digest = xxhash.xxh3_128_intdigest(url.encode('utf-8'))
+        h1 = digest & 0xFFFFFFFFFFFFFFFF
+        h2 = digest >> 64
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, url: str) -> None:
+        """
+        Adiciona uma URL ao filtro.
+
+        Args:
+            url: URL a ser adicionada
+        """
+        for pos in self._positions(url):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def update(self, urls: Iterable[str]) -> int:
+        """
+        Adiciona várias URLs ao filtro, com os atributos resolvidos uma única vez.
+
+        Args:
+            urls: URLs a serem adicionadas
+
+        Returns:
+            Quantidade de URLs adicionadas
+        """
+        bits, size, num_hashes = self.bits, self.size, self.num_hashes
+        digest_of = xxhash.xxh3_128_intdigest
+        count = 0
+        for url in urls:
+            digest = digest_of(url.encode('utf-8'))
+            h1 = digest & 0xFFFFFFFFFFFFFFFF
+            h2 = digest >> 64
+            for i in range(num_hashes):
+                pos = (h1 + i * h2) % size
+                bits[pos >> 3] |= 1 << (pos & 7)
+            count += 1
+        return count
+
+    def __contains__(self, url: str) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(url))
 
-def get_existing_urls(tabela: str) -> Set[str]:
+
+class ExistingUrls:
+    """
+    Links já gravados na tabela de uma empresa. A pertinência é testada no
+    filtro de Bloom e os positivos são confirmados no banco, então o
+    resultado é exato sem manter todos os links em memória. As confirmações
+    recentes são memorizadas, já que o mesmo link é testado a cada página
+    em que aparece; confirm() confirma os links de uma página em uma única
+    consulta, em thread, para que os testes seguintes não consultem o banco.
+    """
+
+    # Quantidade máxima de confirmações memorizadas
+    MEMO_SIZE = 50_000
+
+    def __init__(self, tabela: str, bloom: UrlBloomFilter, count: int):
+        """
+        Args:
+            tabela: Nome da tabela no banco de dados
+            bloom: Filtro de Bloom com os links da tabela
+            count: Quantidade de links carregados no filtro
+        """
+        self.tabela = tabela
+        self.bloom = bloom
+        self.count = count
+        self._conn = None
+        self._memo: Dict[str, bool] = {}
+        # confirm() roda em thread enquanto o loop de eventos testa links
+        self._lock = threading.Lock()
+        # Serializa o uso da conexão entre confirm() e __contains__
+        self._db_lock = threading.Lock()
+
+    def _connection(self):
+        """
+        Obtém a conexão das confirmações, preparando a consulta na primeira
+        vez. Deve ser chamada com self._db_lock adquirido.
+        """
+        if self._conn is None:
+            conn = get_db_connection()
+            try:
+                with conn.cursor() as cur:
+                    cur.execute(
+                        f"PREPARE sel_link_{self.tabela} AS SELECT 1 FROM {self.tabela} WHERE link = $1")
+            except Exception:
+                # Não prender a vaga do pool com uma conexão que não será usada
+                release_db_connection(conn, close=True)
+                raise
+            self._conn = conn
+        return self._conn
+
+    def _remember(self, found: Dict[str, bool]) -> None:
+        """Memoriza confirmações, descartando as mais antigas quando a memória enche."""
+        with self._lock:
+            for url, is_stored in found.items():
+                if len(self._memo) >= self.MEMO_SIZE:
+                    del self._memo[next(iter(self._memo))]
+                self._memo[url] = is_stored
+
+    def unconfirmed(self, urls: Iterable[str]) -> List[str]:
+        """
+        Seleciona os links positivos no filtro de Bloom ainda sem confirmação.
+
+        Args:
+            urls: Links a testar
+
+        Returns:
+            Links (sem repetição) que exigiriam uma consulta ao banco
+        """
+        return [url for url in dict.fromkeys(urls)
+                if url and url not in self._memo and url in self.bloom]
+
+    def confirm(self, urls: List[str]) -> None:
+        """
+        Confirma um lote de links no banco em uma única consulta e memoriza o
+        resultado. Feita para rodar em thread, fora do loop de eventos.
+
+        Args:
+            urls: Links positivos no filtro de Bloom (ver unconfirmed)
+        """
+        with self._db_lock:
+            conn = self._connection()
+            try:
+                with conn.cursor() as cur:
+                    cur.execute(
+                        f"SELECT link FROM {self.tabela} WHERE link = ANY(%s)", (urls,))
+                    stored = {link for (link,) in cur}
+            finally:
+                # Também em caso de erro, para a conexão não ficar com a
+                # transação abortada nas consultas seguintes
+                conn.rollback()
+        self._remember({url: url in stored for url in urls})
+
+    def __contains__(self, url: str) -> bool:
+        if url not in self.bloom:
+            return False
+        found = self._memo.get(url)
+        if found is not None:
+            return found
+        # Link não confirmado em lote: confirmar no banco para descartar
+        # falsos positivos, com a consulta preparada na conexão
+        with self._db_lock:
+            conn = self._connection()
+            try:
+                with conn.cursor() as cur:
+                    cur.execute(f"EXECUTE sel_link_{self.tabela} (%s)", (url,))
+                    found = cur.fetchone() is not None
+            finally:
+                conn.rollback()
+        self._remember({url: found})
+        return found
+
+    def __len__(self) -> int:
+        return self.count
+
+    def close(self) -> None:
+        """Devolve ao pool a conexão usada nas confirmações, se houver."""
+        if self._conn is None:
+            return
+        # Liberar a consulta preparada antes de a conexão voltar ao pool; o
+        # rollback vem antes, pois numa transação abortada o DEALLOCATE falharia.
+        # Se a limpeza falhar, a conexão é descartada, para que o próximo
+        # PREPARE não encontre a consulta já existente
+        descartar = False
+        try:
+            self._conn.rollback()
+            with self._conn.cursor() as cur:
+                cur.execute(f"DEALLOCATE sel_link_{self.tabela}")
+            self._conn.commit()
+        except psycopg2.Error as e:
+            logger.warning(
+                f"Erro ao liberar a consulta preparada de {self.tabela}: {str(e)}")
+            descartar = True
+        release_db_connection(self._conn, close=descartar)
+        self._conn = None
+
+
+def get_existing_urls(tabela: str) -> ExistingUrls:
     """
     Obtém todas as URLs já processadas para uma determinada empresa.
+    As linhas são lidas em blocos por um cursor do lado do servidor e
+    carregadas em um filtro de Bloom dimensionado pelo total da tabela.
 
     Args:
         tabela: Nome da tabela no banco de dados
 
     Returns:
-        Conjunto de URLs já processadas
+        Conjunto de URLs já processadas (use close() ao terminar)
+
+    Raises:
+        ValueError: Se a tabela não for uma das tabelas configuradas em EMPRESAS
     """
+    # O nome da tabela entra na query via f-string, então só aceitamos as configuradas
+    if tabela not in TABELAS_EMPRESAS:
+        raise ValueError(f"Tabela desconhecida: {tabela}")
+
     conn = get_db_connection()
-    cur = conn.cursor()
+    cur = None
     try:
+        with conn.cursor() as count_cur:
+            count_cur.execute(f"SELECT COUNT(*) FROM {tabela}")
+            total = count_cur.fetchone()[0]
+
+        bloom = UrlBloomFilter(total)
+        cur = conn.cursor(name=f"{tabela}_links")
+        cur.itersize = 10000
         cur.execute(f"SELECT link FROM {tabela}")
-        urls = {row[0] for row in cur.fetchall()}
-        return urls
+        count = bloom.update(map(itemgetter(0), cur))
+        return ExistingUrls(tabela, bloom, count)
     except Exception as e:
         logger.error(f"Erro ao obter URLs existentes: {e}")
-        return set()
+        return ExistingUrls(tabela, UrlBloomFilter(1), 0)
     finally:
-        cur.close()
-        conn.close()
+        if cur is not None:
+            try:
+                cur.close()
+            except psycopg2.Error:
+                # O cursor nomeado pode não existir no servidor se a query falhou
+                pass
+        release_db_connection(conn)
 
 
-def is_document_url(url: str) -> bool:
+def ensure_link_unique_index(cur, tabela: str) -> None:
     """
-    Verifica se uma URL aponta para um documento que deve ser baixado.
-    Checa tanto a extensão quanto padrões de caminho comuns para arquivos.
+    Garante a existência de um índice único na coluna link da tabela,
+    necessário para o upsert com ON CONFLICT (link). Nenhuma linha é
+    removida: se a tabela já tiver links duplicados, o índice não é criado
+    e os links são listados no erro para limpeza manual.
+
+    Args:
+        cur: Cursor do banco de dados
+        tabela: Nome da tabela no banco de dados
+
+    Raises:
+        RuntimeError: Se houver links duplicados na tabela
+    """
+    cur.execute("SELECT to_regclass(%s)", (f"{tabela}_link_key",))
+    if cur.fetchone()[0] is not None:
+        return
+
+    cur.execute(f"""
+        SELECT link, count(*) FROM {tabela}
+        GROUP BY link HAVING count(*) > 1
+        ORDER BY count(*) DESC, link
+        LIMIT %s
+    """, (MAX_DUPLICATE_LINKS_REPORTED + 1,))
+    duplicados = cur.fetchall()
+    if duplicados:
+        listagem = "\n".join(
+            f"  {link} ({total} linhas)" for link, total in duplicados[:MAX_DUPLICATE_LINKS_REPORTED])
+        if len(duplicados) > MAX_DUPLICATE_LINKS_REPORTED:
+            listagem += "\n  ..."
+        raise RuntimeError(
+            f"{tabela} tem links duplicados; remova-os antes de criar o índice único "
+            f"{tabela}_link_key:\n{listagem}")
+
+    cur.execute(
+        f"CREATE UNIQUE INDEX IF NOT EXISTS {tabela}_link_key ON {tabela} (link)")
+
+
+def ensure_content_blob_table(cur) -> None:
+    """
+    Garante a tabela content_blob (um corpo por hash), compartilhada por
+    todas as empresas. Executada uma vez em main(), antes de as empresas
+    começarem, para que conexões paralelas não disputem o CREATE TABLE.
+
+    Args:
+        cur: Cursor do banco de dados
+    """
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS content_blob (
+            hash TEXT PRIMARY KEY,
+            body TEXT NOT NULL
+        )
+    """)
+
+
+def prepare_content_blob() -> None:
+    """
+    Cria a tabela content_blob em uma conexão própria, antes de as empresas
+    serem processadas.
+    """
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cur:
+            ensure_content_blob_table(cur)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        release_db_connection(conn)
+
+
+def ensure_content_blob_schema(cur, tabela: str) -> None:
+    """
+    Garante a estrutura da tabela de páginas usada na deduplicação de
+    conteúdo: a coluna content_hash, o índice sobre ela e a view de leitura.
+
+    A primeira página com um dado conteúdo mantém o texto em content; as
+    repetidas ficam com content NULL e o corpo em content_blob (via
+    content_hash), por isso content passa a aceitar NULL. A view
+    {tabela}_conteudo traz o texto na coluna conteudo em ambos os casos.
+    Cada alteração só é executada se ainda faltar, evitando o lock exclusivo
+    do ALTER TABLE a cada execução.
+
+    Args:
+        cur: Cursor do banco de dados
+        tabela: Nome da tabela no banco de dados
+    """
+    cur.execute("""
+        SELECT column_name, is_nullable FROM information_schema.columns
+        WHERE table_schema = current_schema() AND table_name = %s
+          AND column_name IN ('content', 'content_hash')
+    """, (tabela,))
+    colunas = dict(cur.fetchall())
+    if 'content_hash' not in colunas:
+        cur.execute(f"ALTER TABLE {tabela} ADD COLUMN content_hash TEXT")
+    if colunas.get('content') == 'NO':
+        cur.execute(f"ALTER TABLE {tabela} ALTER COLUMN content DROP NOT NULL")
+
+    cur.execute("SELECT to_regclass(%s), to_regclass(%s)",
+                (f"{tabela}_content_hash_idx", f"{tabela}_conteudo"))
+    indice, view = cur.fetchone()
+    if indice is None:
+        cur.execute(
+            f"CREATE INDEX {tabela}_content_hash_idx ON {tabela} (content_hash)")
+    if view is None:
+        # View de leitura com o texto resolvido na coluna conteudo
+        cur.execute(f"""
+            CREATE VIEW {tabela}_conteudo AS
+            SELECT t.*, COALESCE(t.content, b.body) AS conteudo
+            FROM {tabela} t
+            LEFT JOIN content_blob b ON b.hash = t.content_hash
+        """)
+
+
+def dedup_page_contents(cur, tabela: str, rows: List[Tuple]) -> List[Tuple]:
+    """
+    Deduplica o conteúdo das páginas pelo hash xxh3 do markdown. A primeira
+    página com um dado conteúdo o mantém em content; quando o hash já está
+    em content_blob ou no texto de outra página, a página grava apenas o
+    content_hash (content NULL) e o corpo vai uma única vez para content_blob.
+
+    Args:
+        cur: Cursor do banco de dados
+        tabela: Nome da tabela no banco de dados
+        rows: Tuplas (content, link, images, tags, local_path)
+
+    Returns:
+        Tuplas (content ou None, link, images, tags, local_path, content_hash)
+    """
+    hashes = [xxhash.xxh3_64_hexdigest(row[0].encode('utf-8')) for row in rows]
+    distintos = list(set(hashes))
+
+    # Hashes já conhecidos: com corpo em content_blob ou em texto de alguma página
+    cur.execute(
+        "SELECT hash FROM content_blob WHERE hash = ANY(%s)", (distintos,))
+    em_blob = {h for (h,) in cur.fetchall()}
+    cur.execute(
+        f"SELECT content_hash, link FROM {tabela} WHERE content_hash = ANY(%s) AND content IS NOT NULL",
+        ([h for h in distintos if h not in em_blob],))
+    donos: Dict[str, Set[str]] = {}
+    for h, link in cur.fetchall():
+        donos.setdefault(h, set()).add(link)
+
+    result: List[Tuple] = []
+    blobs: Dict[str, str] = {}
+    for h, (content, link, images, tags, local_path) in zip(hashes, rows):
+        # A própria página, regravada com o mesmo conteúdo, continua com o texto
+        if h in em_blob or donos.get(h, set()) - {link}:
+            blobs[h] = content
+            result.append((None, link, images, tags, local_path, h))
+        else:
+            donos.setdefault(h, set()).add(link)
+            result.append((content, link, images, tags, local_path, h))
+
+    if blobs:
+        execute_values(cur, """
+            INSERT INTO content_blob (hash, body)
+            VALUES %s
+            ON CONFLICT (hash) DO NOTHING
+        """, list(blobs.items()), page_size=500)
+
+    return result
+
+
+# Cláusula comum aos upserts de páginas (formatada com a tabela); páginas
+# sem alteração no conteúdo, imagens, tags ou arquivo não são regravadas, e
+# RETURNING (xmax = 0) identifica as linhas recém-inseridas (não atualizadas)
+PAGINAS_ON_CONFLICT = """
+    ON CONFLICT (link) DO UPDATE
+    SET content = EXCLUDED.content,
+        content_hash = EXCLUDED.content_hash,
+        images = EXCLUDED.images,
+        tags = EXCLUDED.tags,
+        local_path = EXCLUDED.local_path,
+        dt_download = CURRENT_TIMESTAMP
+    WHERE ({tabela}.content, {tabela}.content_hash, {tabela}.images, {tabela}.tags, {tabela}.local_path)
+        IS DISTINCT FROM
+        (EXCLUDED.content, EXCLUDED.content_hash, EXCLUDED.images, EXCLUDED.tags, EXCLUDED.local_path)
+    RETURNING (xmax = 0)
+"""
+
+# Upsert de documentos baixados; dispensa a consulta prévia pelo link
+DOCUMENTOS_UPSERT = """
+    INSERT INTO {tabela} (content, link, local_path, tags)
+    VALUES %s
+    ON CONFLICT (link) DO UPDATE
+    SET content = EXCLUDED.content,
+        local_path = EXCLUDED.local_path,
+        tags = EXCLUDED.tags,
+        dt_download = CURRENT_TIMESTAMP
+"""
+
+
+def upsert_documentos(cur, tabela: str, rows: List[Tuple]) -> None:
+    """
+    Insere ou atualiza documentos baixados em lote com um único comando.
+
+    Args:
+        cur: Cursor do banco de dados
+        tabela: Nome da tabela no banco de dados
+        rows: Tuplas (content, link, local_path, tags)
+    """
+    # Um mesmo link não pode aparecer duas vezes no mesmo ON CONFLICT
+    rows = list({row[1]: row for row in rows}.values())
+    if rows:
+        execute_values(cur, DOCUMENTOS_UPSERT.format(tabela=tabela),
+                       rows, page_size=len(rows))
+
+
+def upsert_paginas(cur, tabela: str, rows: List[Tuple]) -> Tuple[int, int]:
+    """
+    Insere ou atualiza páginas em lote com um único INSERT ... ON CONFLICT.
+
+    Args:
+        cur: Cursor do banco de dados
+        tabela: Nome da tabela no banco de dados
+        rows: Tuplas (content, link, images, tags, local_path, content_hash)
+
+    Returns:
+        Tupla (páginas novas, páginas atualizadas; as inalteradas não contam)
+    """
+    # Um mesmo comando não pode atualizar a mesma linha duas vezes,
+    # então mantemos apenas a última ocorrência de cada link
+    rows = list({row[1]: row for row in rows}.values())
+    if not rows:
+        return 0, 0
+
+    inserted = execute_values(cur, f"""
+        INSERT INTO {tabela} (content, link, images, tags, local_path, content_hash)
+        VALUES %s
+        {PAGINAS_ON_CONFLICT.format(tabela=tabela)}
+    """, rows, page_size=500, fetch=True)
+
+    novas = sum(1 for (is_new,) in inserted if is_new)
+    return novas, len(inserted) - novas
+
+
+def copy_array_literal(values) -> str:
+    """
+    Converte uma sequência Python em literal de array PostgreSQL.
+
+    Args:
+        values: Sequência de valores
+
+    Returns:
+        Literal no formato {"a","b"}
+    """
+    return '{' + ','.join(
+        '"' + str(v).replace('\\', '\\\\').replace('"', '\\"') + '"' for v in values) + '}'
+
+
+def copy_text_value(value) -> str:
+    """
+    Escapa um valor para o formato text do COPY.
+
+    Args:
+        value: Valor a ser escapado (None vira NULL, listas viram arrays)
+
+    Returns:
+        Valor escapado
+    """
+    if value is None:
+        return '\\N'
+    if isinstance(value, (list, tuple)):
+        value = copy_array_literal(value)
+    return (str(value)
+            .replace('\\', '\\\\')
+            .replace('\t', '\\t')
+            .replace('\n', '\\n')
+            .replace('\r', '\\r'))
+
+
+def copy_paginas(cur, tabela: str, rows: List[Tuple]) -> Tuple[int, int]:
+    """
+    Carga em massa de páginas via COPY para uma tabela temporária,
+    seguida de um único INSERT ... SELECT ... ON CONFLICT na tabela final.
+
+    Args:
+        cur: Cursor do banco de dados
+        tabela: Nome da tabela no banco de dados
+        rows: Tuplas (content, link, images, tags, local_path, content_hash)
+
+    Returns:
+        Tupla (páginas novas, páginas atualizadas; as inalteradas não contam)
+    """
+    rows = list({row[1]: row for row in rows}.values())
+    if not rows:
+        return 0, 0
+
+    staging = f"stg_{tabela}"
+    cur.execute(
+        f"CREATE TEMP TABLE {staging} (LIKE {tabela} INCLUDING DEFAULTS) ON COMMIT DROP")
+
+    buf = io.StringIO()
+    buf.writelines(
+        '\t'.join(copy_text_value(v) for v in row) + '\n' for row in rows)
+    buf.seek(0)
+    cur.copy_expert(
+        f"COPY {staging} (content, link, images, tags, local_path, content_hash) FROM STDIN WITH (FORMAT text)", buf)
+
+    cur.execute(f"""
+        INSERT INTO {tabela} (content, link, images, tags, local_path, content_hash)
+        SELECT content, link, images, tags, local_path, content_hash FROM {staging}
+        {PAGINAS_ON_CONFLICT.format(tabela=tabela)}
+    """)
+    inserted = cur.fetchall()
+
+    novas = sum(1 for (is_new,) in inserted if is_new)
+    return novas, len(inserted) - novas
+
+
+def copy_arquivos_extraidos(cur, tabela: str, rows: List[Tuple]) -> None:
+    """
+    Insere os arquivos extraídos de um ZIP via COPY direto na tabela final;
+    os links virtuais levam o UUID do ZIP, então são sempre registros novos.
+
+    Args:
+        cur: Cursor do banco de dados
+        tabela: Nome da tabela no banco de dados
+        rows: Tuplas (content, link, local_path, tags, parent_document)
+    """
+    # Um link repetido no mesmo COPY violaria o índice único e descartaria o lote
+    rows = list({row[1]: row for row in rows}.values())
+    buf = io.StringIO()
+    buf.writelines(
+        '\t'.join(copy_text_value(v) for v in row) + '\n' for row in rows)
+    buf.seek(0)
+    cur.copy_expert(
+        f"COPY {tabela} (content, link, local_path, tags, parent_document) FROM STDIN WITH (FORMAT text)", buf)
+
+
+def get_zips_extraidos(cur, tabela: str, links: List[str]) -> Set[str]:
+    """
+    Retorna, dentre os links informados, os ZIPs que já têm arquivos
+    extraídos registrados no banco, em uma única consulta.
+
+    Args:
+        cur: Cursor do banco de dados
+        tabela: Nome da tabela no banco de dados
+        links: Links dos ZIPs a verificar
+
+    Returns:
+        Conjunto dos links com arquivos extraídos
+    """
+    if not links:
+        return set()
+    cur.execute(
+        f"SELECT DISTINCT parent_document FROM {tabela} WHERE parent_document = ANY(%s)",
+        (links,))
+    return {row[0] for row in cur.fetchall()}
+
+
+@lru_cache(maxsize=200_000)
+def classify_document_url(url: str) -> Optional[str]:
+    """
+    Classifica uma URL quanto a apontar para um documento. O resultado é
+    memorizado por URL, já que o mesmo link aparece em muitas páginas.
 
     Args:
         url: URL a ser verificada
 
     Returns:
-        True se a URL for de um documento, False caso contrário
+        Motivo da identificação ('extensão', 'padrão de caminho',
+        'parâmetro de query' ou 'keyword no caminho') ou None se não for documento
     """
     # Verificar se a URL está vazia ou inválida
     if not url or not isinstance(url, str):
-        return False
+        return None
 
     try:
         if not url.startswith(('http://', 'https://')):
-            return False
+            return None
+
+        # Descartar de imediato páginas sem nenhum indício de documento
+        if not _RE_DOCUMENT_MARKERS.search(url):
+            return None
 
         # Parsear a URL
         parsed_url = urlparse(url)
         path = parsed_url.path.lower()
 
         # Verificar extensões conhecidas de documentos - esta é a parte mais importante
-        if any(path.endswith(ext) for ext in DOCUMENT_EXTENSIONS):
-            logger.info(f"Identificado documento por extensão: {url}")
-            return True
+        if path.endswith(_DOCUMENT_EXT_TUPLE):
+            return 'extensão'
 
         # Verificar padrões de caminho comuns para arquivos
-        if any(pattern in path for pattern in DOCUMENT_PATH_PATTERNS):
+        if _RE_DOCUMENT_PATH.search(path):
             # Se o caminho contém um padrão de documento, verificar se não termina com extensões de página web
-            if not path.endswith(('.html', '.htm', '.php', '.asp', '.aspx', '.jsp')):
-                logger.info(
-                    f"Identificado documento por padrão de caminho: {url}")
-                return True
+            if not path.endswith(_WEBPAGE_EXT_TUPLE):
+                return 'padrão de caminho'
 
         # Verificar padrões específicos em parâmetros de query que podem indicar download
         query = parsed_url.query.lower()
-        if ('download=' in query or 'file=' in query or 'attachment=' in query or
-                'document=' in query or 'arquivo=' in query):
-            logger.info(
-                f"Identificado documento por parâmetro de query: {url}")
-            return True
+        if _RE_DOCUMENT_QUERY.search(query):
+            return 'parâmetro de query'
 
         # Verificar keywords específicas no caminho
-        document_keywords = ['download', 'document', 'file',
-                             'arquivo', 'edital', 'formulario', 'anexo']
-        if any(keyword in path.lower() for keyword in document_keywords):
-            logger.info(
-                f"Identificado documento por keyword no caminho: {url}")
-            return True
+        if _RE_DOCUMENT_KEYWORD.search(path):
+            return 'keyword no caminho'
 
-        return False
+        return None
     except Exception as e:
         logger.error(f"Erro ao verificar URL de documento {url}: {str(e)}")
+        return None
+
+
+def is_document_url(url: str) -> bool:
+    """
+    Verifica se uma URL aponta para um documento que deve ser baixado.
+    Checa tanto a extensão quanto padrões de caminho comuns para arquivos.
+
+    Args:
+        url: URL a ser verificada
+
+    Returns:
+        True se a URL for de um documento, False caso contrário
+    """
+    # Valores não-string nem chegam ao cache (precisam ser hasheáveis)
+    if not url or not isinstance(url, str):
         return False
 
+    motivo = classify_document_url(url)
+    if motivo is None:
+        return False
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(f"Identificado documento por {motivo}: {url}")
+    return True
+
 
+@lru_cache(maxsize=200_000)
 def is_definitely_document_url(url: str) -> bool:
     """
     Verificação rigorosa para determinar se uma URL é definitivamente um documento.
     Esta função será usada para evitar que o crawler tente navegar para arquivos de documentos.
+    O resultado é memorizado por URL.
 
     Args:
         url: URL a ser verificada
@@ -493,22 +1511,17 @@ def is_definitely_document_url(url: str) -> bool:
         path = parsed_url.path.lower()
 
         # Verificar extensões de documentos
-        if any(path.endswith(ext) for ext in DOCUMENT_EXTENSIONS):
+        if path.endswith(_DOCUMENT_EXT_TUPLE):
             return True
 
-        # Verificar padrões óbvios no caminho que indicam documentos
-        doc_patterns = ['/download/', '/files/', '/docs/', '/documents/', '/documentos/',
-                        '/arquivos/', '/anexos/', '/storage/']
-        if any(pattern in path for pattern in doc_patterns):
-            for ext in DOCUMENT_EXTENSIONS:
-                if ext[1:] in path:  # ext[1:] remove o ponto inicial
-                    return True
+        # Verificar padrões óbvios no caminho que indicam documentos e se o
+        # nome de alguma extensão (sem o ponto) aparece no caminho
+        if _RE_DEFINITE_DOCUMENT_PATH.search(path) and _RE_DOCUMENT_EXT_ANYWHERE.search(path):
+            return True
 
         # Verificar padrões em parâmetros de query
         query = parsed_url.query.lower()
-        doc_queries = ['download=', 'file=', 'doc=',
-                       'document=', 'attachment=', 'filename=']
-        if any(q in query for q in doc_queries):
+        if _RE_DEFINITE_DOCUMENT_QUERY.search(query):
             return True
 
         return False
@@ -517,6 +1530,35 @@ def is_definitely_document_url(url: str) -> bool:
         return False
 
 
+@lru_cache(maxsize=200_000)
+def classify_crawl_url(url: str) -> Optional[str]:
+    """
+    Classificação do filtro de URLs do crawler que não depende de rede,
+    memorizada por URL, já que o BFS reemite os mesmos links muitas vezes.
+
+    Args:
+        url: URL a ser verificada
+
+    Returns:
+        Mensagem explicando por que a URL não deve ser navegada (é um
+        documento) ou None se a URL pode ser navegada
+    """
+    # Verificação rigorosa para determinar se é um documento
+    if is_definitely_document_url(url):
+        return "Evitando navegação para documento"
+
+    # Verificação adicional para extensões de arquivo conhecidas
+    path = urlparse(url).path.lower()
+    if path.endswith(_DOCUMENT_EXT_TUPLE):
+        return "Evitando navegação para arquivo com extensão conhecida"
+
+    # Verificação rápida para tipos comuns de documentos em URLs
+    if _RE_PATH_DOCUMENT_TYPE.search(path):
+        return "Evitando navegação para possível documento"
+
+    return None
+
+
 def get_file_type(file_path: str) -> str:
     """
     Determina o tipo de arquivo com base na extensão.
@@ -527,32 +1569,20 @@ def get_file_type(file_path: str) -> str:
     Returns:
         Tipo de arquivo como string
     """
-    _, ext = os.path.splitext(file_path.lower())
-
-    if ext == '.pdf':
-        return 'pdf'
-    elif ext in ['.docx', '.doc']:
-        return 'word'
-    elif ext in ['.xlsx', '.xls']:
-        return 'excel'
-    elif ext in ['.pptx', '.ppt']:
-        return 'powerpoint'
-    elif ext == '.csv':
-        return 'csv'
-    elif ext in ['.zip', '.rar', '.7z', '.gz', '.tar', '.bz2', '.xz']:
-        return 'arquivo_compactado'
-    elif ext in ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.svg']:
-        return 'imagem'
-    elif ext in ['.mp4', '.avi', '.mov', '.wmv', '.flv', '.webm']:
-        return 'video'
-    elif ext in ['.mp3', '.wav', '.ogg', '.flac', '.aac']:
-        return 'audio'
-    elif ext == '.txt':
-        return 'texto'
-    elif ext == '.html' or ext == '.htm':
-        return 'html'
-    else:
-        return 'documento'
+    return _EXT_TO_TYPE.get(os.path.splitext(file_path)[1].lower(), 'documento')
+
+
+def ext_for_mime(content_type: str) -> Optional[str]:
+    """
+    Obtém a extensão correspondente a um tipo MIME.
+
+    Args:
+        content_type: Tipo MIME do conteúdo
+
+    Returns:
+        Extensão com ponto, ou None se o tipo for desconhecido
+    """
+    return _EXT_BY_MIME.get(content_type) or mimetypes.guess_extension(content_type)
 
 
 def guess_file_extension(content_type: str, url: str) -> str:
@@ -571,30 +1601,8 @@ def guess_file_extension(content_type: str, url: str) -> str:
     if ext and len(ext) < 10:  # Se tiver uma extensão válida na URL
         return ext
 
-    # Extensões comuns para certos tipos MIME
-    mime_map = {
-        'application/pdf': '.pdf',
-        'application/msword': '.doc',
-        'application/vnd.openxmlformats-officedocument.wordprocessingml.document': '.docx',
-        'application/vnd.ms-excel': '.xls',
-        'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet': '.xlsx',
-        'application/vnd.ms-powerpoint': '.ppt',
-        'application/vnd.openxmlformats-officedocument.presentationml.presentation': '.pptx',
-        'text/csv': '.csv',
-        'application/zip': '.zip',
-        'application/x-rar-compressed': '.rar',
-        'application/x-7z-compressed': '.7z',
-        'application/gzip': '.gz',
-        'application/x-tar': '.tar',
-        'application/x-bzip2': '.bz2',
-        'application/x-xz': '.xz',
-    }
-
-    if content_type in mime_map:
-        return mime_map[content_type]
-
-    # Tentar mimetypes como fallback
-    ext = mimetypes.guess_extension(content_type)
+    # Extensões conhecidas primeiro; mimetypes como fallback
+    ext = ext_for_mime(content_type)
     if ext:
         return ext
 
@@ -606,33 +1614,346 @@ def guess_file_extension(content_type: str, url: str) -> str:
 # =============================================================================
 
 
-async def extract_links_from_page(page_content: str, base_url: str) -> List[str]:
+def parse_links_from_html(page_content: str, base_url: str) -> List[str]:
+    """
+    Extrai links de HTML cru com o parser incremental do lxml.
+
+    Os elementos <a> são liberados assim que lidos, então a memória usada não
+    cresce com o tamanho da página.
+
+    Args:
+        page_content: Conteúdo HTML da página
+        base_url: URL base para resolver links relativos
+
+    Returns:
+        Lista de links extraídos
+    """
+    links = []
+
+    try:
+        for _, elem in etree.iterparse(io.BytesIO(page_content.encode('utf-8')), events=('end',),
+                                       tag='a', html=True, encoding='utf-8'):
+            href = elem.get('href')
+            # Liberar o elemento e os irmãos já processados
+            elem.clear()
+            while elem.getprevious() is not None:
+                del elem.getparent()[0]
+
+            if not href:
+                continue
+            href = href.strip()
+            if href and not href.startswith(('#', 'javascript:', 'mailto:')):
+                # Resolve URLs relativas
+                if not href.startswith(('http://', 'https://')):
+                    href = urllib.parse.urljoin(base_url, href)
+                links.append(href)
+    except etree.LxmlError as e:
+        # HTML vazio ou ilegível: manter os links lidos até o erro
+        logger.debug(f"Erro ao analisar HTML de {base_url}: {str(e)}")
+
+    return links
+
+
+async def extract_links_from_page(page_content: str, base_url: str) -> List[str]:
+    """
+    Extrai links de HTML cru para processamento posterior.
+
+    Args:
+        page_content: Conteúdo HTML da página
+        base_url: URL base para resolver links relativos
+
+    Returns:
+        Lista de links extraídos
+    """
+    return parse_links_from_html(page_content, base_url)
+
+
+def get_markdown_text(result) -> Optional[str]:
+    """
+    Obtém o markdown de um resultado do crawler como string simples.
+
+    Args:
+        result: Resultado do crawler (CrawlResult)
+
+    Returns:
+        Markdown bruto da página ou None se não houver
+    """
+    markdown = getattr(result, 'markdown', None)
+    if markdown is None or isinstance(markdown, str):
+        return markdown
+    raw_markdown = getattr(markdown, 'raw_markdown', None)
+    return raw_markdown if raw_markdown is not None else str(markdown)
+
+
+def render_markdown(markdown: Optional[str], title: Optional[str], text: Optional[str],
+                    cleaned_html: Optional[str], media: Optional[dict],
+                    links: Any) -> Tuple[str, List[str], Optional[str]]:
+    """
+    Monta o conteúdo markdown a partir dos campos já extraídos de um resultado.
+
+    Args:
+        markdown: Markdown bruto da página
+        title: Título da página
+        text: Texto da página
+        cleaned_html: HTML limpo da página
+        media: Dicionário de mídias do resultado
+        links: Links do resultado (dicionário internal/external ou lista)
+
+    Returns:
+        Tupla (conteúdo markdown, URLs das imagens, título)
+    """
+    # Acumular os trechos do markdown e juntá-los uma única vez no final
+    parts: List[str] = []
+    append = parts.append
+
+    # Preparar o conteúdo em markdown
+    if markdown is not None:
+        append(markdown)
+    elif title:
+        # Se não tem markdown mas tem título, criar estrutura básica
+        append(f"# {title}\n\n")
+        if text is not None:
+            append(text)
+        elif cleaned_html is not None:
+            # Tentar converter HTML para markdown usando uma representação simples
+            append(f"```html\n{cleaned_html}\n```")
+    elif text is not None:
+        append(text)
+    else:
+        append("Sem conteúdo disponível")
+
+    # Extrair imagens e adicionar ao conteúdo markdown
+    images = []
+    if isinstance(media, dict) and "images" in media:
+        append("\n\n## Imagens\n\n")
+        for image in media["images"]:
+            if isinstance(image, dict) and "src" in image:
+                src = image["src"]
+                alt = image.get("alt", "Imagem")
+                append(f"![{alt}]({src})\n\n")
+                # Adiciona URL da imagem à lista
+                images.append(src)
+
+    # Se tiver links, adicionar seção de links no markdown
+    if links:
+        append("\n\n## Links\n\n")
+        if isinstance(links, dict):
+            if "internal" in links:
+                append("### Links Internos\n\n")
+                for link in links["internal"]:
+                    if isinstance(link, dict) and "href" in link:
+                        text = link.get("text", link["href"])
+                        append(f"- [{text}]({link['href']})\n")
+            if "external" in links:
+                append("\n### Links Externos\n\n")
+                for link in links["external"]:
+                    if isinstance(link, dict) and "href" in link:
+                        text = link.get("text", link["href"])
+                        append(f"- [{text}]({link['href']})\n")
+        else:
+            for link in links:
+                append(f"- {link}\n")
+
+    content = ''.join(parts)
+    return content, images, title
+
+
+def build_page_record(url: str, markdown: Optional[str], title: Optional[str], text: Optional[str],
+                      cleaned_html: Optional[str], media: Optional[dict], links: Any,
+                      html: Optional[str], nome_empresa: str) -> Tuple[str, List[str], Optional[List[str]], List[str], str]:
+    """
+    Faz todo o processamento de CPU de uma página crawleada e grava o seu HTML
+    em disco. É uma função de nível de módulo para poder rodar em um
+    ProcessPoolExecutor, fora do event loop; recebe apenas campos simples
+    (serializáveis) do resultado.
+
+    Args:
+        url: URL da página
+        markdown: Markdown bruto da página
+        title: Título da página
+        text: Texto da página
+        cleaned_html: HTML limpo da página
+        media: Dicionário de mídias do resultado
+        links: Links do resultado
+        html: HTML original da página
+        nome_empresa: Nome da empresa (diretório de saída do HTML)
+
+    Returns:
+        Tupla (conteúdo markdown, URLs das imagens, tags, links do HTML bruto
+        (vazio se o resultado já trouxer links), caminho do HTML salvo)
+    """
+    content, images, title = render_markdown(
+        markdown, title, text, cleaned_html, media, links)
+
+    # Extrair do HTML bruto apenas quando a estrutura de links do crawler
+    # veio vazia ou ausente, evitando analisar o HTML duas vezes
+    has_links = isinstance(links, dict) and any(
+        links.get(key) for key in ('internal', 'external'))
+    raw_links = parse_links_from_html(
+        html, url) if html is not None and not has_links else []
+
+    # HTML substituto caso o resultado não traga o original
+    fallback_html = None
+    if html is None:
+        if cleaned_html is not None:
+            body = cleaned_html
+        elif text is not None:
+            body = f"<pre>{text}</pre>"
+        else:
+            body = "<p>Sem conteúdo disponível</p>"
+        fallback_html = f"<html><head><title>{title or 'Sem título'}</title></head><body>{body}</body></html>"
+
+    # Extrair tags do caminho da URL
+    tags = extract_path_tags(url)
+
+    # Se não houver tags do caminho, usar subdomínio
+    if not tags:
+        subdomain = extract_subdomain(url)
+        if subdomain and subdomain != 'www':
+            tags.append(subdomain)
+
+    # Remover tags vazias
+    tags = [tag for tag in tags if tag]
+
+    # Salvar o HTML original (ou o substituto, se não houver)
+    html_path = save_html_content(
+        url, html if html is not None else fallback_html, nome_empresa)
+
+    return content, images, tags if tags else None, raw_links, html_path
+
+
+def get_file_size(file_path: str) -> int:
+    """
+    Obtém o tamanho de um arquivo com uma única chamada stat.
+
+    Args:
+        file_path: Caminho do arquivo
+
+    Returns:
+        Tamanho em bytes, ou 0 se o arquivo não existir
+    """
+    try:
+        return os.stat(file_path).st_size
+    except OSError:
+        return 0
+
+
+def hash_file(file_path: str) -> Any:
+    """
+    Calcula o SHA-256 de um arquivo em blocos.
+
+    Args:
+        file_path: Caminho do arquivo
+
+    Returns:
+        Objeto hash com o conteúdo do arquivo
+    """
+    # file_digest lê em blocos com um buffer reutilizado e libera o GIL
+    with open(file_path, 'rb') as f:
+        return hashlib.file_digest(f, 'sha256')
+
+
+def open_preallocated(file_path: str, size: int) -> int:
+    """
+    Cria (ou trunca) um arquivo para escrita e pré-aloca o tamanho conhecido.
+
+    Args:
+        file_path: Caminho do arquivo
+        size: Tamanho final esperado em bytes
+
+    Returns:
+        Descritor do arquivo aberto para escrita (fechar com os.close)
+    """
+    flags = os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, 'O_BINARY', 0)
+    fd = os.open(file_path, flags, 0o644)
+    if hasattr(os, 'posix_fallocate') and size:
+        # Nem todo sistema de arquivos suporta pré-alocação
+        with contextlib.suppress(OSError):
+            os.posix_fallocate(fd, 0, size)
+    return fd
+
+
+def pwrite_all(fd: int, data: bytes, offset: int) -> None:
     """
-    Extrai links de HTML cru usando regex para processamento posterior.
+    Grava todo o bloco na posição indicada, repetindo em escritas parciais.
 
     Args:
-        page_content: Conteúdo HTML da página
-        base_url: URL base para resolver links relativos
+        fd: Descritor do arquivo de destino
+        data: Bytes a gravar
+        offset: Posição inicial no arquivo
+    """
+    view = memoryview(data)
+    while view:
+        written = os.pwrite(fd, view, offset)
+        view = view[written:]
+        offset += written
 
-    Returns:
-        Lista de links extraídos
+
+async def ranged_download(session: aiohttp.ClientSession, url: str, local_path: str, size: int,
+                          headers: Dict[str, str], timeout: aiohttp.ClientTimeout,
+                          etag: Optional[str] = None, parts: int = RANGED_DOWNLOAD_PARTS) -> bool:
     """
-    links = []
+    Baixa um documento grande em partes paralelas com requisições Range,
+    gravando cada parte diretamente na sua posição do arquivo final.
 
-    # Regex para extrair href de tags <a>
-    href_pattern = re.compile(
-        r'<a\s+(?:[^>]*?\s+)?href=(["\'])(.*?)\1', re.IGNORECASE)
-    matches = href_pattern.findall(page_content)
+    Args:
+        session: Sessão HTTP (o limite por host do connector continua valendo)
+        url: URL do documento
+        local_path: Caminho do arquivo de destino
+        size: Tamanho total informado pelo servidor
+        headers: Cabeçalhos base das requisições
+        timeout: Timeout de cada requisição
+        etag: ETag da resposta original; com If-Range, uma versão diferente
+            do documento faz o servidor responder 200 e a parte é rejeitada
+        parts: Quantidade de partes
 
-    for _, href in matches:
-        href = href.strip()
-        if href and not href.startswith(('#', 'javascript:', 'mailto:')):
-            # Resolve URLs relativas
-            if not href.startswith(('http://', 'https://')):
-                href = urllib.parse.urljoin(base_url, href)
-            links.append(href)
+    Returns:
+        True se todas as partes foram baixadas; False caso contrário (o
+        arquivo parcial deve ser descartado pelo chamador)
+    """
+    part_size = -(-size // parts)
+    # Criação e pré-alocação do arquivo fora do loop de eventos
+    fd = await asyncio.to_thread(open_preallocated, local_path, size)
+
+    async def fetch_part(start: int) -> None:
+        end = min(start + part_size, size) - 1
+        part_headers = {**headers, 'Range': f'bytes={start}-{end}'}
+        if etag:
+            part_headers['If-Range'] = etag
+        async with session.get(url, headers=part_headers, timeout=timeout, allow_redirects=True) as resp:
+            if (resp.status != 206 or resp.content_length != end - start + 1
+                    or not resp.headers.get('Content-Range', '').startswith(f'bytes {start}-{end}/')):
+                raise ValueError(
+                    f"resposta inesperada para a parte {start}-{end}: status {resp.status}")
+            offset = start
+            buffer = bytearray()
+            async for chunk in resp.content.iter_chunked(64 * 1024):
+                buffer += chunk
+                if len(buffer) >= DOWNLOAD_WRITE_BUFFER:
+                    await asyncio.to_thread(pwrite_all, fd, bytes(buffer), offset)
+                    offset += len(buffer)
+                    buffer.clear()
+            if buffer:
+                await asyncio.to_thread(pwrite_all, fd, bytes(buffer), offset)
+                offset += len(buffer)
+            if offset != end + 1:
+                raise ValueError(f"parte {start}-{end} incompleta")
 
-    return links
+    try:
+        # Uma parte com falha cancela as demais
+        async with asyncio.timeout(DOWNLOAD_TIMEOUT):
+            async with asyncio.TaskGroup() as tg:
+                for start in range(0, size, part_size):
+                    tg.create_task(fetch_part(start))
+        return True
+    except Exception as e:
+        # Do grupo de exceções do TaskGroup, registrar a primeira falha
+        erro = e.exceptions[0] if isinstance(e, ExceptionGroup) else e
+        logger.warning(
+            f"Download em partes falhou para {url}, usando fluxo único: {erro}")
+        return False
+    finally:
+        os.close(fd)
 
 
 def save_html_content(url: str, html_content: str, nome_empresa: str) -> str:
@@ -657,48 +1978,60 @@ def save_html_content(url: str, html_content: str, nome_empresa: str) -> str:
         filename = f"{filename}.html"
 
     file_path = os.path.join(html_dir, filename)
+    data = html_content.encode('utf-8')
+
+    # Não regravar o arquivo se o conteúdo salvo for idêntico (recrawls)
+    if get_file_size(file_path) == len(data):
+        with open(file_path, 'rb') as f:
+            if f.read() == data:
+                return file_path
 
     # Salvar o conteúdo no arquivo
-    with open(file_path, 'w', encoding='utf-8') as f:
-        f.write(html_content)
+    with open(file_path, 'wb') as f:
+        f.write(data)
 
     return file_path
 
 
-async def download_document(url: str, nome_empresa: str, session: aiohttp.ClientSession) -> Tuple[bool, str, str]:
+async def download_document(url: str, nome_empresa: str, session: aiohttp.ClientSession,
+                            cache_db: Optional[sqlite3.Connection] = None) -> Tuple[bool, str, str, bool]:
     """
     Baixa um documento e retorna seu caminho local, com sistema de retry.
+    Se houver validadores HTTP no cache, faz uma requisição condicional e
+    reaproveita o arquivo local quando o servidor responde 304; o hash do
+    conteúdo baixado também é comparado ao do cache para detectar documentos
+    substituídos por bytes idênticos.
 
     Args:
         url: URL do documento
         nome_empresa: Nome da empresa para determinar o diretório
         session: Sessão HTTP para fazer o download
+        cache_db: Cache de metadados HTTP dos documentos (opcional)
 
     Returns:
-        Tupla (sucesso, caminho_local, tipo_arquivo)
+        Tupla (sucesso, caminho_local, tipo_arquivo, alterado), em que alterado
+        é False quando o conteúdo é o mesmo já presente em disco
     """
     # Criar diretório para documentos na nova estrutura
     docs_dir = get_documents_output_dir(nome_empresa)
 
-    # Determinar nome original do arquivo da URL
-    parsed_url = urlparse(url)
-    original_filename = os.path.basename(parsed_url.path)
+    # Determinar nome original e extensão do arquivo a partir da URL (uma única vez)
+    path = urlparse(url).path
+    original_filename = os.path.basename(path)
+    original_extension = os.path.splitext(path)[1]
 
     # Remover fragmentos (#) da URL que possam causar problemas
-    clean_url = url.split('#')[0]
+    clean_url = url.partition('#')[0]
 
-    # Se a URL termina com # ou tem apenas fragmentos, provavelmente não é um documento válido
-    if clean_url.endswith('/') or not clean_url or clean_url == url.split('#')[0]:
+    # Se a URL tem apenas fragmento ou termina em /, provavelmente não é um documento válido
+    if not clean_url or clean_url.endswith('/'):
         logger.warning(f"URL possivelmente inválida para documento: {url}")
         if '#' in url and not clean_url:
             logger.error(f"URL contém apenas um fragmento, ignorando: {url}")
-            return False, "", ""
+            return False, "", "", False
 
-    # Limpar URLs duplicadas (problema observado com URLs como .pdf.pdf)
-    if any(ext + ext in clean_url.lower() for ext in DOCUMENT_EXTENSIONS):
-        for ext in DOCUMENT_EXTENSIONS:
-            if ext + ext in clean_url.lower():
-                clean_url = clean_url.replace(ext + ext, ext)
+    # Limpar extensões duplicadas (problema observado com URLs como .pdf.pdf)
+    clean_url = _RE_DOUBLE_EXT.sub(r'\1', clean_url)
 
     # Se o nome original for válido, usá-lo; caso contrário, gerar um nome sanitizado
     if original_filename and len(original_filename) < 100 and not original_filename.endswith('/'):
@@ -707,7 +2040,6 @@ async def download_document(url: str, nome_empresa: str, session: aiohttp.Client
         # Gerar um nome de arquivo sanitizado
         filename = sanitize_filename(clean_url)
         # Tentar preservar a extensão
-        _, original_extension = os.path.splitext(parsed_url.path)
         if original_extension and len(original_extension) < 10:
             filename = f"{filename}{original_extension}"
         else:
@@ -715,16 +2047,32 @@ async def download_document(url: str, nome_empresa: str, session: aiohttp.Client
             filename = f"{filename}.bin"
 
     # Certificar-se de que não há caracteres inválidos
-    filename = re.sub(r'[\\/*?:"<>|]', '_', filename)
+    filename = filename.translate(_FILENAME_TABLE)
 
     local_path = os.path.join(docs_dir, filename)
 
-    # Verificar se o arquivo já existe
-    if os.path.exists(local_path):
+    # Cabeçalhos condicionais a partir do ETag/Last-Modified salvos no cache
+    conditional_headers = {}
+    cached = get_document_validators(
+        cache_db, clean_url) if cache_db is not None else None
+    if cached and (cached[0] or cached[1]) and os.path.exists(cached[3]):
+        etag, last_modified, _, cached_path = cached
+        if etag:
+            conditional_headers['If-None-Match'] = etag
+        if last_modified:
+            conditional_headers['If-Modified-Since'] = last_modified
+
+    # Verificar se o arquivo já existe (pela listagem do diretório, sem stat),
+    # desde que o caminho não pertença a outra URL nesta execução
+    elif (filename in get_docs_dir_listing(docs_dir)
+          and _DOC_PATH_OWNERS.setdefault(local_path, clean_url) == clean_url):
         file_extension = os.path.splitext(filename)[1].lstrip('.')
         if not file_extension:
             file_extension = "documento"
-        return True, local_path, file_extension
+        return True, local_path, file_extension, False
+
+    # Download em partes desativado após uma falha, para o fluxo único
+    usar_range = True
 
     # Implementar sistema de retry
     for attempt in range(MAX_RETRIES):
@@ -744,28 +2092,26 @@ async def download_document(url: str, nome_empresa: str, session: aiohttp.Client
             logger.info(
                 f"Iniciando download de: {clean_url} (tentativa {attempt+1}/{MAX_RETRIES})")
 
-            # Verificar rapidamente se a URL é válida antes de tentar o download completo
-            try:
-                async with session.head(clean_url, headers=headers, timeout=aiohttp.ClientTimeout(total=10), allow_redirects=True) as head_response:
-                    if head_response.status >= 400:
-                        logger.warning(
-                            f"URL retornou status {head_response.status}: {clean_url}")
-                        if head_response.status == 404:
-                            logger.error(
-                                f"Documento não encontrado (404): {clean_url}")
-                        return False, "", ""
-            except Exception as head_error:
-                logger.warning(
-                    f"Erro ao verificar cabeçalho: {str(head_error)}, tentando download direto")
-
+            # Sem HEAD prévio: status e cabeçalhos do próprio GET decidem se o
+            # corpo é lido; ao sair do bloco sem lê-lo, a resposta é descartada.
             # Usar a mesma sessão que foi passada como parâmetro, que já deve ter SSL desabilitado
-            async with session.get(clean_url, headers=headers, timeout=timeout, allow_redirects=True) as response:
+            async with session.get(clean_url, headers={**headers, **conditional_headers}, timeout=timeout, allow_redirects=True) as response:
+                # Documento não modificado desde o último download
+                if response.status == 304 and conditional_headers:
+                    logger.info(
+                        f"Documento não modificado (304), usando cópia local: {cached_path}")
+                    file_extension = os.path.splitext(
+                        cached_path)[1].lstrip('.')
+                    return True, cached_path, file_extension or "documento", False
+
                 if response.status != 200:
                     logger.error(
                         f"Erro ao baixar {clean_url}: Status {response.status} (tentativa {attempt+1}/{MAX_RETRIES})")
                     # Se for 404, não tentar novamente
                     if response.status == 404:
-                        return False, "", ""
+                        logger.error(
+                            f"Documento não encontrado (404): {clean_url}")
+                        return False, "", "", False
                     # Para outros erros, tentar novamente
                     # Backoff exponencial
                     await asyncio.sleep(2 * (attempt + 1))
@@ -776,19 +2122,21 @@ async def download_document(url: str, nome_empresa: str, session: aiohttp.Client
                     'Content-Type', '').split(';')[0].strip().lower()
 
                 # Verificar se o Content-Type indica um arquivo binário vs texto/html
-                if 'text/html' in content_type and not any(ext in filename.lower() for ext in DOCUMENT_EXTENSIONS):
+                if 'text/html' in content_type and not _RE_DOCUMENT_EXT_IN_NAME.search(filename):
                     logger.info(
                         f"Ignorando {clean_url} com Content-Type: {content_type}")
-                    return False, "", ""
+                    return False, "", "", False
 
                 # Tentar obter nome do arquivo do header Content-Disposition
                 content_disposition = response.headers.get(
                     'Content-Disposition', '')
                 if 'filename=' in content_disposition:
-                    cd_filename = re.findall(
-                        'filename=["\'](.*?)["\']', content_disposition)
+                    cd_filename = _RE_CD_FILENAME.findall(content_disposition)
                     if cd_filename:
-                        new_filename = cd_filename[0]
+                        # Sanitizar também o nome vindo do servidor, que
+                        # poderia conter barras (ex.: '../')
+                        new_filename = cd_filename[0].translate(
+                            _FILENAME_TABLE)
                         if new_filename and len(new_filename) < 100:
                             # Atualizar o nome do arquivo se encontramos um válido no header
                             filename = new_filename
@@ -801,98 +2149,123 @@ async def download_document(url: str, nome_empresa: str, session: aiohttp.Client
                         filename = os.path.splitext(filename)[0] + ext
                         local_path = os.path.join(docs_dir, filename)
 
-                # Criar o diretório pai se não existir (para casos de subdiretórios)
-                os.makedirs(os.path.dirname(local_path), exist_ok=True)
+                # Reservar o caminho antes de abrir o arquivo; nomes já usados
+                # por outra URL recebem um sufixo
+                local_path = reserve_document_path(local_path, clean_url)
+                filename = os.path.basename(local_path)
+
+                # Documentos grandes em servidores que aceitam Range são baixados
+                # em partes paralelas; se falhar, a próxima tentativa usa fluxo único
+                content_length = response.content_length or 0
+                if (usar_range and attempt < MAX_RETRIES - 1
+                        and content_length >= RANGED_DOWNLOAD_MIN_SIZE
+                        and response.headers.get('Accept-Ranges', '').lower() == 'bytes'
+                        and 'Content-Encoding' not in response.headers):
+                    # Descartar o corpo desta resposta; as partes usam novas requisições
+                    response.close()
+                    logger.info(
+                        f"Baixando {clean_url} em {RANGED_DOWNLOAD_PARTS} partes para {local_path}")
+                    if not await ranged_download(session, str(response.url), local_path,
+                                                 content_length, headers, timeout,
+                                                 response.headers.get('ETag')):
+                        usar_range = False
+                        with contextlib.suppress(FileNotFoundError):
+                            os.remove(local_path)
+                        continue
+                    content_size = content_length
+                    content_hash = await asyncio.to_thread(hash_file, local_path)
+                    download_complete = True
+                else:
+                    # Salvar o conteúdo do arquivo com timeout para cada chunk
+                    logger.info(f"Baixando {clean_url} para {local_path}")
 
-                # Salvar o conteúdo do arquivo com timeout para cada chunk
-                logger.info(f"Baixando {clean_url} para {local_path}")
+                    # Usar um timeout para o download do conteúdo
+                    content_size = 0
+                    content_hash = hashlib.sha256()
+                    download_complete = False
+                    try:
+                        async with aiofiles.open(local_path, 'wb') as f:
+                            chunk_size = 64 * 1024  # 64KB por chunk
 
-                # Usar um timeout para o download do conteúdo
-                content_size = 0
-                try:
-                    with open(local_path, 'wb') as f:
-                        chunk_size = 1024 * 1024  # 1MB por chunk
-                        download_start_time = asyncio.get_event_loop().time()
-
-                        while True:
-                            # Verificar timeout para evitar travamentos
-                            current_time = asyncio.get_event_loop().time()
-                            if current_time - download_start_time > DOWNLOAD_TIMEOUT:
-                                raise asyncio.TimeoutError(
-                                    f"Timeout ao baixar conteúdo de {clean_url}")
-
-                            # Ler chunk com timeout
+                            # Os chunks são acumulados e gravados em blocos maiores,
+                            # reduzindo as idas à thread de escrita do aiofiles
+                            write_buffer = bytearray()
                             try:
-                                chunk = await asyncio.wait_for(
-                                    response.content.read(chunk_size),
-                                    timeout=30
-                                )
-                            except asyncio.TimeoutError:
-                                logger.warning(
-                                    f"Timeout ao ler chunk de {clean_url}")
-                                if content_size > 0:
-                                    # Se já baixou algum conteúdo, considera como sucesso parcial
-                                    break
-                                else:
-                                    raise
-
-                            if not chunk:
-                                break
-
-                            f.write(chunk)
-                            content_size += len(chunk)
-                except Exception as chunk_error:
-                    logger.error(f"Erro ao baixar chunks: {str(chunk_error)}")
-                    # Se baixou algum conteúdo, considera sucesso parcial
-                    if content_size > 0 and os.path.exists(local_path) and os.path.getsize(local_path) > 0:
-                        logger.warning(
-                            f"Download parcial para {local_path} ({content_size} bytes)")
-                    else:
-                        # Se não baixou nada, remover arquivo vazio e tentar novamente
-                        if os.path.exists(local_path):
-                            os.remove(local_path)
-                        if attempt < MAX_RETRIES - 1:
-                            await asyncio.sleep(2 * (attempt + 1))
-                            continue
-                        return False, "", ""
+                                # Um único prazo para todo o corpo; leituras travadas
+                                # também são limitadas pelo sock_read da requisição
+                                async with asyncio.timeout(DOWNLOAD_TIMEOUT):
+                                    async for chunk in response.content.iter_chunked(chunk_size):
+                                        write_buffer += chunk
+                                        content_hash.update(chunk)
+                                        content_size += len(chunk)
+
+                                        if len(write_buffer) >= DOWNLOAD_WRITE_BUFFER:
+                                            await f.write(write_buffer)
+                                            write_buffer.clear()
+                            finally:
+                                # Gravar o restante, inclusive em downloads parciais
+                                if write_buffer:
+                                    await f.write(write_buffer)
+
+                            download_complete = True
+                    except Exception as chunk_error:
+                        logger.error(
+                            f"Erro ao baixar chunks de {clean_url}: {type(chunk_error).__name__} {str(chunk_error)}")
+                        # Se baixou algum conteúdo, considera sucesso parcial
+                        if content_size > 0 and get_file_size(local_path) > 0:
+                            logger.warning(
+                                f"Download parcial para {local_path} ({content_size} bytes)")
+                        else:
+                            # Se não baixou nada, remover arquivo vazio e tentar novamente
+                            with contextlib.suppress(FileNotFoundError):
+                                os.remove(local_path)
+                            if attempt < MAX_RETRIES - 1:
+                                await asyncio.sleep(2 * (attempt + 1))
+                                continue
+                            return False, "", "", False
 
                 # Verificar se o arquivo foi salvo e tem conteúdo
-                if not os.path.exists(local_path) or os.path.getsize(local_path) == 0:
+                file_size = get_file_size(local_path)
+                if file_size == 0:
                     logger.error(
                         f"Arquivo baixado está vazio ou não existe: {local_path}")
-                    if os.path.exists(local_path):
+                    with contextlib.suppress(FileNotFoundError):
                         os.remove(local_path)
                     if attempt < MAX_RETRIES - 1:
                         await asyncio.sleep(2 * (attempt + 1))
                         continue
-                    return False, "", ""
+                    return False, "", "", False
 
                 logger.info(
-                    f"Download concluído: {local_path} ({os.path.getsize(local_path)} bytes)")
+                    f"Download concluído: {local_path} ({file_size} bytes)")
+
+                # Registrar validadores para requisições condicionais futuras
+                # (downloads parciais não são registrados)
+                if cache_db is not None and download_complete:
+                    save_document_validators(
+                        cache_db, clean_url,
+                        response.headers.get('ETag'),
+                        response.headers.get('Last-Modified'),
+                        content_hash.hexdigest(), content_size, local_path)
 
                 # Determinar o tipo de arquivo
                 file_extension = os.path.splitext(filename)[1].lstrip('.')
 
                 if not file_extension:
                     # Se não tem extensão, derivar do content-type
-                    if 'pdf' in content_type:
-                        file_type = 'pdf'
-                    elif 'excel' in content_type or 'spreadsheet' in content_type:
-                        file_type = 'excel'
-                    elif 'word' in content_type:
-                        file_type = 'word'
-                    elif 'csv' in content_type:
-                        file_type = 'csv'
-                    elif 'powerpoint' in content_type or 'presentation' in content_type:
-                        file_type = 'powerpoint'
-                    elif 'zip' in content_type or 'compressed' in content_type:
-                        file_type = 'arquivo_compactado'
-                    else:
-                        file_type = 'documento'
+                    file_type = next(
+                        (tipo for trecho, tipo in _MIME_SUBSTR_TYPE if trecho in content_type), 'documento')
                 else:
                     file_type = file_extension
 
-                return True, local_path, file_type
+                get_docs_dir_listing(docs_dir).add(
+                    os.path.basename(local_path))
+                alterado = not (download_complete and cached and cached[3] == local_path
+                                and cached[2] == content_hash.hexdigest())
+                if not alterado:
+                    logger.info(
+                        f"Conteúdo idêntico ao já baixado: {clean_url}")
+                return True, local_path, file_type, alterado
 
         except asyncio.TimeoutError:
             logger.error(
@@ -901,146 +2274,294 @@ async def download_document(url: str, nome_empresa: str, session: aiohttp.Client
                 # Espera antes de tentar novamente
                 await asyncio.sleep(2 * (attempt + 1))
             else:
-                return False, "", ""
+                return False, "", "", False
         except aiohttp.ClientError as ce:
             logger.error(
                 f"Erro de cliente ao baixar {url}: {str(ce)} (tentativa {attempt+1}/{MAX_RETRIES})")
             if attempt < MAX_RETRIES - 1:
                 await asyncio.sleep(2 * (attempt + 1))
             else:
-                return False, "", ""
+                return False, "", "", False
         except Exception as e:
             logger.error(
                 f"Erro ao baixar {url}: {str(e)} (tentativa {attempt+1}/{MAX_RETRIES})")
             if attempt < MAX_RETRIES - 1:
                 await asyncio.sleep(2 * (attempt + 1))
             else:
-                return False, "", ""
+                return False, "", "", False
 
     # Se chegou aqui, todas as tentativas falharam
-    return False, "", ""
+    return False, "", "", False
 
 # =============================================================================
 # FUNÇÕES PRINCIPAIS DE PROCESSAMENTO
 # =============================================================================
 
 
-async def extract_zip_file(zip_path: str, extract_dir: str, nome_empresa: str, cur, tabela: str, parent_url: str) -> List[str]:
+def copy_stored_zip_member(src_fd: int, info: zipfile.ZipInfo, dst_fd: int) -> bool:
     """
-    Extrai o conteúdo de um arquivo ZIP e salva informações sobre os arquivos extraídos no banco.
+    Copia um membro armazenado sem compressão (ZIP_STORED) direto do arquivo
+    ZIP para o destino no kernel, com os.copy_file_range ou os.sendfile.
 
     Args:
-        zip_path: Caminho para o arquivo ZIP
-        extract_dir: Diretório onde extrair os arquivos
-        nome_empresa: Nome da empresa para organização
-        cur: Cursor do banco de dados
-        tabela: Tabela onde salvar as informações
-        parent_url: URL original do arquivo ZIP
+        src_fd: Descritor do arquivo ZIP aberto para leitura
+        info: Membro a copiar
+        dst_fd: Descritor do arquivo de destino, posicionado no início
 
     Returns:
-        Lista dos caminhos dos arquivos extraídos
+        True se o membro foi copiado; False se o caminho rápido não se aplica
+        (o destino volta ao início para a cópia convencional)
     """
-    extracted_files = []
-    zip_tags = extract_path_tags(parent_url)
+    if (info.compress_type != zipfile.ZIP_STORED or info.flag_bits & 0x1
+            or not hasattr(os, 'pread')):
+        return False
 
-    # Obter diretório de destino para arquivos extraídos
-    final_extracted_dir = get_extracted_output_dir(nome_empresa)
+    # Cabeçalho local: 30 bytes fixos + nome + campo extra antes dos dados
+    header = os.pread(src_fd, 30, info.header_offset)
+    if len(header) != 30 or header[:4] != b'PK\x03\x04':
+        return False
+    name_len, extra_len = struct.unpack('<HH', header[26:30])
+    offset = info.header_offset + 30 + name_len + extra_len
+    remaining = info.file_size
+
+    for copy in (getattr(os, 'copy_file_range', None), getattr(os, 'sendfile', None)):
+        if copy is None:
+            continue
+        try:
+            while remaining:
+                if copy is os.sendfile:
+                    copied = os.sendfile(dst_fd, src_fd, offset, remaining)
+                else:
+                    copied = os.copy_file_range(
+                        src_fd, dst_fd, remaining, offset)
+                if copied == 0:
+                    break
+                offset += copied
+                remaining -= copied
+            if not remaining:
+                return True
+        except OSError:
+            # Sistema de arquivos sem suporte (EXDEV, ENOSYS, EINVAL...)
+            continue
+
+    # Voltar ao início e deixar a cópia convencional sobrescrever o parcial
+    os.lseek(dst_fd, 0, os.SEEK_SET)
+    return False
 
-    # Adicionar tag genérica
-    if 'arquivo_compactado' not in zip_tags:
-        zip_tags.append('arquivo_compactado')
 
+def write_zip_member(zip_ref: zipfile.ZipFile, raw_fd: int, info: zipfile.ZipInfo, final_path: str, buffer: bytearray) -> None:
+    """
+    Grava um membro do ZIP em disco sem buffer intermediário em espaço de
+    usuário, pré-alocando o tamanho conhecido do arquivo.
+
+    Args:
+        zip_ref: ZIP aberto (exclusivo da thread atual)
+        raw_fd: Descritor do mesmo ZIP para cópias pelo kernel
+        info: Membro a gravar
+        final_path: Caminho de destino
+        buffer: Buffer reutilizado entre membros na cópia convencional
+    """
+    dst_fd = open_preallocated(final_path, info.file_size)
     try:
-        logger.info(f"Extraindo arquivo ZIP: {zip_path}")
-        with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-            # Lista dos arquivos no ZIP
-            zip_contents = zip_ref.namelist()
+        if copy_stored_zip_member(raw_fd, info, dst_fd):
+            return
+
+        view = memoryview(buffer)
+        with zip_ref.open(info) as src:
+            while n := src.readinto(buffer):
+                written = 0
+                while written < n:
+                    written += os.write(dst_fd, view[written:n])
+    finally:
+        os.close(dst_fd)
 
-            # Criar um UUID para este ZIP específico para relacionar os arquivos extraídos
-            zip_uuid = str(uuid.uuid4())
 
-            # Criar diretório específico para este ZIP dentro do diretório de extraídos
-            zip_specific_dir = os.path.join(
-                final_extracted_dir, os.path.basename(zip_path).replace('.zip', ''))
-            os.makedirs(zip_specific_dir, exist_ok=True)
+def zip_member_relpath(member_name: str) -> str:
+    """
+    Converte o caminho de um membro do ZIP em um caminho relativo seguro,
+    preservando as pastas internas e descartando componentes que sairiam do
+    diretório de destino ('..', '.', raiz).
 
-            # Extrair todos os arquivos primeiro para o diretório temporário
-            zip_ref.extractall(extract_dir)
+    Args:
+        member_name: Nome do membro dentro do ZIP
 
-            # Processar cada arquivo extraído
-            for item in zip_contents:
-                if item.endswith('/'):  # Diretório
-                    continue
+    Returns:
+        Caminho relativo com '/' como separador ('' se não restar nada)
+    """
+    parts = (part.translate(_FILENAME_TABLE)
+             for part in member_name.replace('\\', '/').split('/'))
+    return '/'.join(part for part in parts if part not in ('', '.', '..'))
 
-                extracted_path = os.path.join(extract_dir, item)
 
-                # Verificar se o arquivo existe após a extração
-                if not os.path.exists(extracted_path):
-                    logger.warning(
-                        f"Arquivo extraído não encontrado: {extracted_path}")
-                    continue
+def extract_zip_members(zip_path: str, members: List[Tuple[zipfile.ZipInfo, str]], zip_specific_dir: str, zip_tags: List[str], zip_uuid: str, parent_url: str) -> List[Tuple[tuple, str]]:
+    """
+    Extrai um grupo de membros de um ZIP e monta as linhas para o banco.
 
-                # Verificar tamanho do arquivo (ignorar arquivos vazios)
-                file_size = os.path.getsize(extracted_path)
-                if file_size == 0:
-                    logger.info(f"Ignorando arquivo vazio: {item}")
-                    continue
+    Executada em thread; abre seu próprio ZipFile, pois o objeto não é seguro
+    para leituras concorrentes. Os membros são lidos em ordem crescente de
+    deslocamento, para que a leitura do arquivo seja sequencial.
 
-                # Determinar tipo do arquivo
-                file_type = get_file_type(item)
+    Args:
+        zip_path: Caminho para o arquivo ZIP
+        members: Pares (membro, caminho relativo único de destino) a extrair
+        zip_specific_dir: Diretório de destino dos arquivos extraídos
+        zip_tags: Tags herdadas do ZIP
+        zip_uuid: Identificador do ZIP usado no link virtual
+        parent_url: URL original do arquivo ZIP
 
-                # Mover o arquivo para o diretório final
-                final_filename = os.path.basename(item)
-                final_path = os.path.join(zip_specific_dir, final_filename)
+    Returns:
+        Lista de tuplas (linha para o banco, caminho do arquivo extraído)
+    """
+    results = []
+    zip_basename = os.path.basename(zip_path)
+    dest_prefix = zip_specific_dir + os.sep
+    buffer = bytearray(ZIP_COPY_BUFFER)
+    base_tags = (*zip_tags, 'extraido_de_zip')
+    created_dirs = {zip_specific_dir}
+    with open(zip_path, 'rb') as raw_zip, zipfile.ZipFile(raw_zip, 'r') as zip_ref:
+        # O mesmo arquivo atende o ZipFile e as cópias pelo kernel, que usam
+        # deslocamentos explícitos e não movem a posição do arquivo
+        raw_fd = raw_zip.fileno()
+        if hasattr(os, 'posix_fadvise'):
+            os.posix_fadvise(raw_fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        for info, member_path in sorted(members, key=lambda m: m[0].header_offset):
+            item = info.filename
+
+            # Determinar tipo do arquivo
+            file_type = get_file_type(item)
+
+            # Nome do arquivo para exibição; o destino preserva as pastas do
+            # ZIP, para que membros com o mesmo nome em pastas diferentes não
+            # se sobrescrevam
+            filename = os.path.basename(member_path)
+            final_path = dest_prefix + member_path.replace('/', os.sep)
+            final_dir = os.path.dirname(final_path)
+            if final_dir not in created_dirs:
+                os.makedirs(final_dir, exist_ok=True)
+                created_dirs.add(final_dir)
+
+            # Copiar o membro diretamente do ZIP para o destino final; membros
+            # sem compressão são copiados pelo kernel, sem passar pelo Python
+            write_zip_member(zip_ref, raw_fd, info, final_path, buffer)
+            logger.info(f"Arquivo extraído para: {final_path}")
+
+            # Criar caminho relativo para armazenar no banco
+            rel_path = get_project_relpath(final_path)
+
+            # Criar tags para o arquivo extraído (tags do ZIP pai + tipo)
+            file_tags = (*base_tags, file_type)
+
+            # Criar link virtual para referenciar o arquivo extraído
+            virtual_link = f"{parent_url}#extracted/{zip_uuid}/{member_path}"
+
+            # Criar conteúdo markdown com informações sobre o arquivo extraído
+            content = (
+                f"# Arquivo extraído: {filename}\n\n"
+                f"**Tipo:** {file_type}\n\n"
+                f"**Extraído de:** [{zip_basename}]({parent_url})\n\n"
+                f"**Caminho dentro do ZIP:** {item}\n\n"
+                f"**Arquivo local:** {rel_path}\n\n"
+                f"**Tamanho:** {info.file_size} bytes\n\n"
+            )
 
-                # Garantir que o diretório de destino existe
-                os.makedirs(os.path.dirname(final_path), exist_ok=True)
+            results.append(
+                ((content, virtual_link, rel_path, file_tags, parent_url), final_path))
+    return results
 
-                # Copiar o arquivo para o destino final
-                shutil.copy2(extracted_path, final_path)
-                logger.info(f"Arquivo extraído movido para: {final_path}")
 
-                # Criar caminho relativo para armazenar no banco
-                script_dir = os.path.dirname(os.path.abspath(__file__))
-                project_dir = os.path.dirname(script_dir)
-                rel_path = os.path.relpath(final_path, project_dir)
+def list_zip_members(zip_path: str, zip_specific_dir: str) -> List[zipfile.ZipInfo]:
+    """
+    Lê o diretório central do ZIP e cria o diretório de destino.
 
-                # Criar tags para o arquivo extraído
-                file_tags = list(zip_tags)  # Copiar as tags do ZIP pai
-                file_tags.append('extraido_de_zip')
-                file_tags.append(file_type)
+    Args:
+        zip_path: Caminho para o arquivo ZIP
+        zip_specific_dir: Diretório de destino dos arquivos extraídos
 
-                # Nome do arquivo para exibição
-                filename = os.path.basename(item)
+    Returns:
+        Membros do ZIP
+    """
+    with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+        infos = zip_ref.infolist()
+    os.makedirs(zip_specific_dir, exist_ok=True)
+    return infos
 
-                # Criar link virtual para referenciar o arquivo extraído
-                virtual_link = f"{parent_url}#extracted/{zip_uuid}/{filename}"
 
-                # Criar conteúdo markdown com informações sobre o arquivo extraído
-                content = f"# Arquivo extraído: {filename}\n\n"
-                content += f"**Tipo:** {file_type}\n\n"
-                content += f"**Extraído de:** [{os.path.basename(zip_path)}]({parent_url})\n\n"
-                content += f"**Caminho dentro do ZIP:** {item}\n\n"
-                content += f"**Arquivo local:** {rel_path}\n\n"
-                content += f"**Tamanho:** {file_size} bytes\n\n"
+async def extract_zip_file(zip_path: str, nome_empresa: str, parent_url: str) -> List[Tuple]:
+    """
+    Extrai o conteúdo de um arquivo ZIP e monta as linhas dos arquivos extraídos.
 
-                # Inserir no banco de dados
-                try:
-                    # Insert - os arquivos extraídos são sempre novos registros
-                    cur.execute(f"""
-                        INSERT INTO {tabela} (content, link, local_path, tags, parent_document)
-                        VALUES (%s, %s, %s, %s, %s)
-                    """, (content, virtual_link, rel_path, file_tags, parent_url))
+    Cada membro é copiado em fluxo direto do ZIP para o destino final, sem
+    extração intermediária em diretório temporário. Os membros são divididos
+    em grupos descompactados em paralelo por threads. A gravação no banco fica
+    a cargo do chamador, que acumula as linhas de vários ZIPs em um só COPY.
 
-                    logger.info(f"Arquivo extraído salvo no banco: {item}")
-                    extracted_files.append(final_path)
+    Args:
+        zip_path: Caminho para o arquivo ZIP
+        nome_empresa: Nome da empresa para organização
+        parent_url: URL original do arquivo ZIP
 
-                except Exception as e:
-                    logger.error(
-                        f"Erro ao salvar arquivo extraído no banco: {str(e)}")
-                    # Não fazer rollback aqui para não afetar outras operações
+    Returns:
+        Tuplas (content, link, local_path, tags, parent_document) dos arquivos extraídos
+    """
+    zip_tags = extract_path_tags(parent_url)
+
+    # Obter diretório de destino para arquivos extraídos
+    final_extracted_dir = get_extracted_output_dir(nome_empresa)
+
+    # Adicionar tag genérica
+    if 'arquivo_compactado' not in zip_tags:
+        zip_tags.append('arquivo_compactado')
+
+    try:
+        logger.info(f"Extraindo arquivo ZIP: {zip_path}")
 
-        return extracted_files
+        # Criar um UUID para este ZIP específico para relacionar os arquivos extraídos
+        zip_uuid = str(uuid.uuid4())
+
+        # Diretório específico para este ZIP dentro do diretório de extraídos;
+        # a leitura do ZIP e a criação do diretório rodam fora do loop de eventos
+        zip_basename = os.path.basename(zip_path)
+        zip_stem = zip_basename[:-4] if zip_basename.lower().endswith('.zip') else zip_basename
+        zip_specific_dir = os.path.join(final_extracted_dir, zip_stem)
+        infos = await asyncio.to_thread(list_zip_members, zip_path, zip_specific_dir)
+
+        # Distribuir os membros entre os grupos; cada membro recebe um caminho
+        # de destino único (e, com ele, um link virtual único)
+        num_groups = os.cpu_count() or 1
+        groups: List[List[Tuple[zipfile.ZipInfo, str]]] = [[] for _ in range(num_groups)]
+        used_paths: Set[str] = set()
+        for info in infos:
+            if info.is_dir():  # Diretório
+                continue
+
+            # Verificar tamanho do arquivo (ignorar arquivos vazios)
+            if info.file_size == 0:
+                logger.info(f"Ignorando arquivo vazio: {info.filename}")
+                continue
+
+            member_path = zip_member_relpath(info.filename)
+            if not member_path:
+                logger.info(f"Ignorando membro com nome inválido: {info.filename}")
+                continue
+
+            # Nomes repetidos (entradas duplicadas ou iguais após a sanitização)
+            # recebem um sufixo numérico
+            if member_path in used_paths:
+                stem, ext = os.path.splitext(member_path)
+                n = 1
+                while f"{stem}_{n}{ext}" in used_paths:
+                    n += 1
+                member_path = f"{stem}_{n}{ext}"
+            used_paths.add(member_path)
+
+            groups[hash(member_path) % num_groups].append((info, member_path))
+
+        group_results = await asyncio.gather(*(
+            asyncio.to_thread(extract_zip_members, zip_path, group, zip_specific_dir,
+                              zip_tags, zip_uuid, parent_url)
+            for group in groups if group))
+
+        return [row for results in group_results for row, _ in results]
 
     except zipfile.BadZipFile:
         logger.error(f"Arquivo ZIP corrompido ou inválido: {zip_path}")
@@ -1054,7 +2575,7 @@ async def extract_zip_file(zip_path: str, extract_dir: str, nome_empresa: str, c
 # =============================================================================
 
 
-async def process_empresa(nome_empresa: str, force_update: bool = False, skip_browser: bool = False, use_cache: bool = True) -> None:
+async def process_empresa(nome_empresa: str, force_update: bool = False, skip_browser: bool = False, use_cache: bool = True, bulk: bool = False, max_downloads: int = MAX_CONCURRENT_DOWNLOADS, crawler: Optional[AsyncWebCrawler] = None, page_pool: Optional[ProcessPoolExecutor] = None) -> None:
     """
     Processa o crawler para uma empresa específica.
 
@@ -1063,6 +2584,13 @@ async def process_empresa(nome_empresa: str, force_update: bool = False, skip_br
         force_update: Se deve forçar atualização de todas as páginas
         skip_browser: Se deve usar detecção antecipada de arquivos e pular navegação por browser
         use_cache: Se deve usar o sistema de cache para URLs já processadas
+        bulk: Se deve gravar as páginas via COPY (carga inicial em massa); o
+              COPY é usado automaticamente quando a tabela ainda está vazia
+        max_downloads: Número máximo de downloads de documentos simultâneos
+        crawler: Instância de AsyncWebCrawler compartilhada entre empresas; se None,
+            um browser próprio é aberto e fechado para esta empresa
+        page_pool: Pool de processos para o processamento de CPU das páginas; se
+            None, usa o executor padrão do event loop
     """
     if nome_empresa not in EMPRESAS:
         logger.error(
@@ -1072,161 +2600,190 @@ async def process_empresa(nome_empresa: str, force_update: bool = False, skip_br
     config = EMPRESAS[nome_empresa]
     logger.info(f"Iniciando crawler para {nome_empresa.upper()}...")
 
-    # Registrar adaptador para listas
-    register_adapter(list, adapt_list)
-
-    # Obter URLs já processadas do BD e do cache
-    existing_urls = set()
+    # Obter URLs já processadas do BD
+    existing_urls: Optional[ExistingUrls] = None
     if not force_update:
-        # Carregar URLs do banco de dados
-        existing_urls = get_existing_urls(config["tabela"])
+        # Carregar URLs do banco de dados; a leitura da tabela inteira roda em
+        # thread para não travar as demais empresas no modo paralelo
+        existing_urls = await asyncio.to_thread(get_existing_urls, config["tabela"])
         logger.info(
             f"Encontradas {len(existing_urls)} URLs já processadas no banco para {nome_empresa}")
 
-        # Se uso de cache estiver habilitado, adicionar também as URLs do cache
-        if use_cache:
-            cache_urls = load_crawled_urls_from_cache(nome_empresa)
-            existing_urls.update(cache_urls)
-            logger.info(
-                f"Adicionadas {len(cache_urls)} URLs do cache para {nome_empresa}")
-
-    # Lista para armazenar URLs processadas nesta execução
-    crawled_urls = set()
-
-    # Lista para armazenar URLs de documentos que encontramos
-    document_urls = []
-
-    # Carregar documentos já processados do cache para evitar reprocessamento
-    if use_cache and not force_update:
-        cached_documents = load_documents_from_cache(nome_empresa)
+    # Cache local de páginas e documentos já processados, consultado sob demanda
+    url_cache = UrlCache(nome_empresa) if use_cache else None
+    if url_cache is not None and not force_update:
         logger.info(
-            f"Carregados {len(cached_documents)} documentos do cache para {nome_empresa}")
-        # Remover documentos já processados da lista de processar
-        existing_urls.update(cached_documents)
-
-    # Configurações do browser com modo verboso
-    browser_config = BrowserConfig(verbose=True)
-
-    # Verificar se a empresa precisa de configuração especial simplificada
-    use_simplified = config.get("use_simplified_crawler", False)
-
-    # Configuração avançada do crawler - personalizada para cada empresa se necessário
-    if use_simplified and nome_empresa == "ceitec":
-        # Usar configuração simples para CEITEC baseada no script que funcionava
-        run_config = CrawlerRunConfig(
-            deep_crawl_strategy=BFSDeepCrawlStrategy(
-                max_depth=config["max_depth"],
-                include_external=config["include_external"],
-                max_pages=10000
-            ),
-            # Configurações mínimas que funcionavam no script antigo
-            word_count_threshold=10,
-            exclude_external_links=True,
-            remove_overlay_elements=True,
-            process_iframes=True,
-            cache_mode=CacheMode.DISABLED,
-        )
-        logger.info(f"Usando configuração simplificada para {nome_empresa}")
-    else:
-        # Usar configuração padrão para as outras empresas
-        run_config = CrawlerRunConfig(
-            deep_crawl_strategy=BFSDeepCrawlStrategy(
-                max_depth=config["max_depth"],
-                include_external=config["include_external"],
-                max_pages=10000
-            ),
-            # Configurações de limpeza de conteúdo
-            word_count_threshold=10,  # Mínimo de palavras por bloco de conteúdo
-            excluded_tags=config["excluded_tags"],  # Tags para excluir
-            # Múltiplos seletores separados por vírgula
-            excluded_selector=config["excluded_selector"],
-            exclude_external_links=True,  # Remover links externos
-            remove_overlay_elements=True,  # Remover popups/modals
-            process_iframes=True,  # Processar conteúdo de iframes
-            cache_mode=CacheMode.DISABLED,  # Desabilitar completamente o cache
-        )
+            f"Cache local com {len(url_cache)} URLs já processadas para {nome_empresa}")
+
+    try:
+        def ja_processada(url: str) -> bool:
+            """Indica se a URL já foi processada (no banco ou no cache local)."""
+            if force_update:
+                return False
+            if url_cache is not None and url in url_cache:
+                return True
+            try:
+                return url in existing_urls
+            except psycopg2.Error as e:
+                # Na dúvida, processar: o upsert com ON CONFLICT evita a duplicação
+                logger.warning(
+                    f"Erro ao verificar se {url} já foi processada: {str(e)}")
+                return False
 
-    # Lista para armazenar URLs de documentos que encontramos
-    document_urls = []
+        async def confirmar_existentes(links: Iterable[str]) -> None:
+            """
+            Confirma no banco, em uma única consulta fora do loop de eventos, os
+            links positivos no filtro de Bloom, para que ja_processada não
+            consulte o banco link a link.
+            """
+            if existing_urls is None:
+                return
+            pendentes = existing_urls.unconfirmed(links)
+            if pendentes:
+                try:
+                    await asyncio.to_thread(existing_urls.confirm, pendentes)
+                except psycopg2.Error as e:
+                    logger.warning(
+                        f"Erro ao confirmar links existentes: {str(e)}")
+
+        # Lista para armazenar URLs processadas nesta execução
+        crawled_urls = set()
+
+        # Configurações do browser com modo verboso
+        browser_config = BrowserConfig(verbose=True)
+
+        # Verificar se a empresa precisa de configuração especial simplificada
+        use_simplified = config.get("use_simplified_crawler", False)
+
+        # Configuração avançada do crawler - personalizada para cada empresa se necessário
+        if use_simplified and nome_empresa == "ceitec":
+            # Usar configuração simples para CEITEC baseada no script que funcionava
+            run_config = CrawlerRunConfig(
+                deep_crawl_strategy=BFSDeepCrawlStrategy(
+                    max_depth=config["max_depth"],
+                    include_external=config["include_external"],
+                    max_pages=10000
+                ),
+                # Configurações mínimas que funcionavam no script antigo
+                word_count_threshold=10,
+                exclude_external_links=True,
+                remove_overlay_elements=True,
+                process_iframes=True,
+                cache_mode=CacheMode.DISABLED,
+                stream=True,  # Entregar resultados conforme são crawleados
+            )
+            logger.info(f"Usando configuração simplificada para {nome_empresa}")
+        else:
+            # Usar configuração padrão para as outras empresas
+            run_config = CrawlerRunConfig(
+                deep_crawl_strategy=BFSDeepCrawlStrategy(
+                    max_depth=config["max_depth"],
+                    include_external=config["include_external"],
+                    max_pages=10000
+                ),
+                # Configurações de limpeza de conteúdo
+                word_count_threshold=10,  # Mínimo de palavras por bloco de conteúdo
+                excluded_tags=config["excluded_tags"],  # Tags para excluir
+                # Múltiplos seletores separados por vírgula
+                excluded_selector=config["excluded_selector"],
+                exclude_external_links=True,  # Remover links externos
+                remove_overlay_elements=True,  # Remover popups/modals
+                process_iframes=True,  # Processar conteúdo de iframes
+                cache_mode=CacheMode.DISABLED,  # Desabilitar completamente o cache
+                stream=True,  # Entregar resultados conforme são crawleados
+            )
 
-    # Lista para armazenar URLs com alta probabilidade de serem documentos
-    probable_document_urls = set()
+        # URLs de documentos que encontramos (dict como conjunto ordenado, para
+        # testes de pertinência O(1) preservando a ordem de descoberta)
+        document_urls: Dict[str, None] = {}
 
-    # Desativar verificação SSL independentemente da opção --no-ssl-verify
-    # para garantir consistência em todas as requisições
-    ssl_context = None  # None será tratado como ssl=False nas requisições
+        # Lista para armazenar URLs com alta probabilidade de serem documentos
+        probable_document_urls = set()
 
-    # Verificar se a empresa tem configuração específica para ignorar erros de SSL
-    ignore_ssl = config.get("ignore_ssl_errors", False)
+        # Desativar verificação SSL independentemente da opção --no-ssl-verify
+        # para garantir consistência em todas as requisições
+        ssl_context = None  # None será tratado como ssl=False nas requisições
 
-    # Criar uma sessão HTTP para download de documentos com SSL desativado
-    conn_timeout = aiohttp.ClientTimeout(
-        total=3600)  # 1 hora para a sessão completa
+        # Verificar se a empresa tem configuração específica para ignorar erros de SSL
+        ignore_ssl = config.get("ignore_ssl_errors", False)
 
-    # Usar TCPConnector com verify_ssl=False em vez de ssl=False
-    connector = aiohttp.TCPConnector(verify_ssl=False)
+        # Criar uma sessão HTTP para download de documentos com SSL desativado
+        conn_timeout = aiohttp.ClientTimeout(
+            total=3600)  # 1 hora para a sessão completa
 
-    # Para a CEITEC, vamos usar configurações de conexão mais tolerantes
-    if nome_empresa == "ceitec":
+        # SSL desativado diretamente no connector; o pool comporta os downloads
+        # simultâneos sem sobrecarregar um único host e mantém DNS e conexões
+        # keep-alive para reaproveitar os handshakes
         connector = aiohttp.TCPConnector(
-            verify_ssl=False,
-            force_close=True,  # Forçar fechamento de conexões para evitar problemas
-            enable_cleanup_closed=True,  # Limpar conexões fechadas
-            limit=10  # Limitar número de conexões paralelas
+            ssl=False, limit=100, limit_per_host=8,
+            ttl_dns_cache=300, keepalive_timeout=60)
+
+        # Para a CEITEC, vamos usar configurações de conexão mais tolerantes,
+        # sem abrir mão do reaproveitamento das conexões keep-alive
+        if nome_empresa == "ceitec":
+            connector = aiohttp.TCPConnector(
+                ssl=False,
+                enable_cleanup_closed=True,  # Limpar conexões fechadas
+                limit=10,  # Limitar número de conexões paralelas
+                ttl_dns_cache=300
+            )
+            logger.info(
+                f"Usando configuração de conexão otimizada para {nome_empresa}")
+
+        # Usar timeout mais resistente a travamentos
+        timeout = aiohttp.ClientTimeout(
+            total=GLOBAL_TIMEOUT,  # Timeout global para toda a sessão
+            connect=CONNECT_TIMEOUT,  # Timeout para estabelecer conexão
+            sock_connect=CONNECT_TIMEOUT,  # Timeout para conectar socket
+            sock_read=DOWNLOAD_TIMEOUT  # Timeout para ler dados do socket
         )
-        logger.info(
-            f"Usando configuração de conexão otimizada para {nome_empresa}")
-
-    # Usar timeout mais resistente a travamentos
-    timeout = aiohttp.ClientTimeout(
-        total=GLOBAL_TIMEOUT,  # Timeout global para toda a sessão
-        connect=CONNECT_TIMEOUT,  # Timeout para estabelecer conexão
-        sock_connect=CONNECT_TIMEOUT,  # Timeout para conectar socket
-        sock_read=DOWNLOAD_TIMEOUT  # Timeout para ler dados do socket
-    )
 
-    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
-        # Função para checagem rápida de URLs de documentos quando skip_browser=True
-        async def check_document_head(url: str) -> bool:
-            """Faz uma requisição HEAD para verificar se o URL é um documento sem baixá-lo"""
-            try:
-                headers = {
-                    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-                }
-                async with session.head(url, headers=headers, timeout=30, allow_redirects=True) as response:
-                    if response.status != 200:
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            # Função para checagem rápida de URLs de documentos quando skip_browser=True
+            async def check_document_head(url: str) -> bool:
+                """Faz uma requisição HEAD para verificar se o URL é um documento sem baixá-lo"""
+                try:
+                    headers = {
+                        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+                    }
+                    async with session.head(url, headers=headers, timeout=30, allow_redirects=True) as response:
+                        status = response.status
+                        content_type = response.headers.get(
+                            'Content-Type', '').lower()
+
+                    # Servidores que recusam HEAD: pedir apenas o primeiro byte via GET
+                    if status in (403, 405):
+                        range_headers = {**headers, 'Range': 'bytes=0-0'}
+                        async with session.get(url, headers=range_headers, timeout=30, allow_redirects=True) as response:
+                            status = 200 if response.status == 206 else response.status
+                            content_type = response.headers.get(
+                                'Content-Type', '').lower()
+
+                    if status != 200:
                         return False
 
                     # Verificar pelo content-type
-                    content_type = response.headers.get(
-                        'Content-Type', '').lower()
-                    if any(doc_type in content_type for doc_type in [
-                        'pdf', 'msword', 'document', 'excel', 'spreadsheet',
-                        'powerpoint', 'presentation', 'zip', 'compressed',
-                        'octet-stream'
-                    ]):
+                    if _RE_DOCUMENT_CONTENT_TYPE.search(content_type):
                         return True
 
                     # Verificar pela extensão da URL
-                    _, ext = os.path.splitext(urlparse(url).path.lower())
-                    if ext in DOCUMENT_EXTENSIONS:
+                    if urlparse(url).path.lower().endswith(_DOCUMENT_EXT_TUPLE):
                         return True
 
                     return False
-            except Exception as e:
-                logger.debug(f"Erro ao verificar HEAD {url}: {str(e)}")
-                return False
+                except Exception as e:
+                    logger.debug(f"Erro ao verificar HEAD {url}: {str(e)}")
+                    return False
 
-        # Antes de executar o crawler, tente obter links da página inicial
-        # para CEITEC, vamos pular esta etapa conforme o script antigo
-        if not (nome_empresa == "ceitec" and use_simplified):
-            try:
-                logger.info(
-                    f"Fazendo análise prévia da página inicial de {nome_empresa}")
-                # Usar um cliente HTTP com SSL desabilitado, mas de forma correta
-                connector = aiohttp.TCPConnector(verify_ssl=False)
-                async with aiohttp.ClientSession(connector=connector) as ssl_disabled_session:
-                    async with ssl_disabled_session.get(config["url"], timeout=30) as response:
+            # Antes de executar o crawler, tente obter links da página inicial
+            # para CEITEC, vamos pular esta etapa conforme o script antigo
+            if not (nome_empresa == "ceitec" and use_simplified):
+                try:
+                    logger.info(
+                        f"Fazendo análise prévia da página inicial de {nome_empresa}")
+                    initial_links = []
+                    # Reaproveitar a sessão (e o pool de conexões) dos downloads
+                    async with session.get(config["url"], timeout=30) as response:
                         if response.status == 200:
                             html_content = await response.text()
                             initial_links = await extract_links_from_page(html_content, config["url"])
@@ -1237,335 +2794,407 @@ async def process_empresa(nome_empresa: str, force_update: bool = False, skip_br
                                     probable_document_urls.add(link)
                                     logger.info(
                                         f"Documento identificado na página inicial: {link}")
-            except Exception as e:
-                logger.error(
-                    f"Erro na análise prévia da página inicial: {str(e)}")
 
-        # Filtro para URLs já processadas e para identificar documentos
-        async def should_process_url(url: str) -> bool:
-            if not url or not isinstance(url, str):
-                return False
-
-            try:
-                # Prevenir que URLs inválidas sejam processadas
-                if not url.startswith(('http://', 'https://')):
-                    return False
-
-                # Verificação rigorosa para determinar se é um documento
-                if is_definitely_document_url(url):
-                    logger.info(f"Evitando navegação para documento: {url}")
-                    # Adicionar à lista de documentos para download direto
-                    if url not in document_urls and (force_update or url not in existing_urls):
-                        document_urls.append(url)
-                    return False  # NUNCA processar URLs que são definitivamente documentos
-
-                # Verificação adicional para extensões de arquivo conhecidas
-                parsed_url = urlparse(url)
-                path = parsed_url.path.lower()
-                if any(path.endswith(ext) for ext in DOCUMENT_EXTENSIONS):
-                    logger.info(
-                        f"Evitando navegação para arquivo com extensão conhecida: {url}")
-                    if url not in document_urls and (force_update or url not in existing_urls):
-                        document_urls.append(url)
-                    return False
-
-                # Verificação rápida para tipos comuns de documentos em URLs
-                doc_keywords = ['pdf', 'doc', 'docx',
-                                'xls', 'xlsx', 'ppt', 'pptx', 'zip']
-                if any(keyword in path for keyword in doc_keywords):
-                    logger.info(
-                        f"Evitando navegação para possível documento: {url}")
-                    if url not in document_urls and (force_update or url not in existing_urls):
-                        document_urls.append(url)
-                    return False
-
-                # Verificar cabeçalhos da URL antes de navegar para confirmar que não é um documento
-                if skip_browser:
-                    try:
-                        headers = {
-                            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-                        }
-                        # Usar a sessão existente que já tem SSL desabilitado corretamente
-                        head_response = await session.head(url, headers=headers, timeout=10, allow_redirects=True)
-
-                        # Verificar content-type
-                        content_type = head_response.headers.get(
-                            'Content-Type', '').lower()
+                    # Com skip_browser, confirmar por HEAD, em paralelo, os demais
+                    # links do próprio site antes do crawl, em vez de um a um no filtro
+                    if skip_browser:
+                        start_host = urlparse(config["url"]).netloc
+                        await confirmar_existentes(initial_links)
+                        candidatos = [
+                            link for link in dict.fromkeys(initial_links)
+                            if link not in probable_document_urls
+                            and link.startswith(('http://', 'https://'))
+                            and (config["include_external"] or urlparse(link).netloc == start_host)
+                            and not ja_processada(link)]
+                        head_semaphore = asyncio.Semaphore(HEAD_CHECK_CONCURRENCY)
+
+                        async def bounded_head(link: str) -> bool:
+                            async with head_semaphore:
+                                return await check_document_head(link)
+
+                        confirmados = await asyncio.gather(
+                            *(bounded_head(link) for link in candidatos))
+                        for link, is_document in zip(candidatos, confirmados):
+                            if is_document:
+                                probable_document_urls.add(link)
+                                if link not in document_urls:
+                                    document_urls[link] = None
+                                logger.info(
+                                    f"Documento identificado por HEAD na página inicial: {link}")
+                except Exception as e:
+                    logger.error(
+                        f"Erro na análise prévia da página inicial: {str(e)}")
 
-                        # Se o content-type indicar que é um documento, não navegar
-                        if any(doc_type in content_type for doc_type in [
-                            'pdf', 'msword', 'document', 'excel', 'spreadsheet',
-                            'powerpoint', 'presentation', 'zip', 'compressed',
-                            'octet-stream', 'binary'
-                        ]):
-                            logger.info(
-                                f"Evitando navegação baseado no Content-Type {content_type}: {url}")
-                            if url not in document_urls and (force_update or url not in existing_urls):
-                                document_urls.append(url)
-                            return False
-                    except Exception as e:
-                        # Em caso de erro, prosseguir com a navegação mas registrar o problema
-                        logger.debug(
-                            f"Erro ao verificar cabeçalhos de {url}: {str(e)}")
-
-                # Verificação mais ampla para possíveis documentos
-                if url in probable_document_urls or is_document_url(url):
-                    if url not in document_urls and (force_update or url not in existing_urls):
-                        document_urls.append(url)
-                    return False  # Não processar URLs que provavelmente são documentos
-
-                # Não processar URLs já baixadas anteriormente, a menos que force_update seja True
-                if not force_update and url in existing_urls:
+            # Filtro para URLs já processadas e para identificar documentos
+            async def should_process_url(url: str) -> bool:
+                if not url or not isinstance(url, str):
                     return False
 
-                # Processar URLs que não são documentos e que não estão em existing_urls (ou force_update é True)
-                return True
-            except Exception as e:
-                logger.error(f"Erro no filtro de URL {url}: {str(e)}")
-                return False  # Em caso de erro, não processar a URL
-
-        # Modificar o crawler para interceptar solicitações ao browser
-        async with AsyncWebCrawler(config=browser_config) as crawler:
-            # Adicionar o filtro de URLs ao crawler
-            if nome_empresa == "ceitec" and use_simplified:
-                # Para CEITEC, desativamos o filtro de URL completamente, como no script original
-                crawler.url_filter = None
-                logger.info(f"Desativando filtro de URL para {nome_empresa}")
-            else:
-                # Para outras empresas, usar o filtro normal
-                crawler.url_filter = should_process_url
-
-            # Executar o crawler para páginas HTML
-            results = await crawler.arun(config["url"], config=run_config)
-
-            # Adicionar URLs processadas à lista para salvar no cache
-            for result in results:
-                if result.success:
-                    crawled_urls.add(result.url)
-
-            logger.info(
-                f"Crawled {len(results)} páginas HTML para {nome_empresa}")
-
-            # Conectar ao banco de dados
-            conn = get_db_connection()
-            cur = conn.cursor()
-
-            novas_paginas = 0
-            atualizadas = 0
+                try:
+                    # Prevenir que URLs inválidas sejam processadas
+                    if not url.startswith(('http://', 'https://')):
+                        return False
 
-            # Processar os resultados do crawler (páginas HTML)
-            for result in results:
-                if not result.success:
-                    logger.error(
-                        f"Falha ao crawlear {result.url}: {result.error_message}")
-                    continue
+                    # Classificação sem rede (memorizada por URL)
+                    motivo = classify_crawl_url(url)
+                    if motivo:
+                        logger.info(f"{motivo}: {url}")
+                        # Adicionar à lista de documentos para download direto
+                        if url not in document_urls and not ja_processada(url):
+                            document_urls[url] = None
+                        return False  # NUNCA processar URLs que são documentos
+
+                    # Verificação mais ampla para possíveis documentos
+                    if url in probable_document_urls or is_document_url(url):
+                        if url not in document_urls and not ja_processada(url):
+                            document_urls[url] = None
+                        return False  # Não processar URLs que provavelmente são documentos
+
+                    # Não processar URLs já baixadas anteriormente, a menos que force_update seja True
+                    if ja_processada(url):
+                        return False
 
-                # Verificar links na página para encontrar documentos adicionais
-                if hasattr(result, 'links') and result.links:
-                    # Extrair links de documentos da estrutura de links
-                    if isinstance(result.links, dict):
-                        all_links = []
-                        if "internal" in result.links:
-                            all_links.extend([link.get("href") for link in result.links["internal"]
-                                             if isinstance(link, dict) and "href" in link])
-                        if "external" in result.links:
-                            all_links.extend([link.get("href") for link in result.links["external"]
-                                             if isinstance(link, dict) and "href" in link])
-
-                        # Adicionar links para documentos à lista
-                        for link in all_links:
-                            if link and is_document_url(link) and link not in document_urls and link not in existing_urls:
-                                document_urls.append(link)
-                                logger.info(f"Documento encontrado: {link}")
-
-                # Também extrair do HTML bruto para caso a estrutura de links falhe
-                if hasattr(result, 'html'):
-                    raw_links = await extract_links_from_page(result.html, result.url)
-                    for link in raw_links:
-                        if link and is_document_url(link) and link not in document_urls and link not in existing_urls:
-                            document_urls.append(link)
-                            logger.info(
-                                f"Documento encontrado (via HTML): {link}")
-
-                # Preparar o conteúdo em markdown
-                content = ""
-                if hasattr(result, 'markdown'):
-                    if isinstance(result.markdown, str):
-                        content = result.markdown
-                    elif hasattr(result.markdown, 'raw_markdown'):
-                        content = result.markdown.raw_markdown
-                    else:
-                        content = str(result.markdown)
-                elif hasattr(result, 'title') and result.title:
-                    # Se não tem markdown mas tem título, criar estrutura básica
-                    content = f"# {result.title}\n\n"
-                    if hasattr(result, 'text'):
-                        content += result.text
-                    elif hasattr(result, 'cleaned_html'):
-                        # Tentar converter HTML para markdown usando uma representação simples
-                        content += f"```html\n{result.cleaned_html}\n```"
-                elif hasattr(result, 'text'):
-                    content = result.text
-                else:
-                    content = "Sem conteúdo disponível"
-
-                # Extrair imagens e adicionar ao conteúdo markdown
-                images = []
-                if hasattr(result, 'media') and isinstance(result.media, dict) and "images" in result.media:
-                    content += "\n\n## Imagens\n\n"
-                    for image in result.media["images"]:
-                        if isinstance(image, dict) and "src" in image:
-                            src = image["src"]
-                            alt = image.get("alt", "Imagem")
-                            content += f"![{alt}]({src})\n\n"
-                            # Adiciona URL da imagem à lista
-                            images.append(src)
-
-                # Se tiver links, adicionar seção de links no markdown
-                if hasattr(result, 'links') and result.links:
-                    content += "\n\n## Links\n\n"
-                    if isinstance(result.links, dict):
-                        if "internal" in result.links:
-                            content += "### Links Internos\n\n"
-                            for link in result.links["internal"]:
-                                if isinstance(link, dict) and "href" in link:
-                                    text = link.get("text", link["href"])
-                                    content += f"- [{text}]({link['href']})\n"
-                        if "external" in result.links:
-                            content += "\n### Links Externos\n\n"
-                            for link in result.links["external"]:
-                                if isinstance(link, dict) and "href" in link:
-                                    text = link.get("text", link["href"])
-                                    content += f"- [{text}]({link['href']})\n"
+                    # Processar URLs que não são documentos e que ainda não foram processadas (ou force_update é True)
+                    return True
+                except Exception as e:
+                    logger.error(f"Erro no filtro de URL {url}: {str(e)}")
+                    return False  # Em caso de erro, não processar a URL
+
+            # Reaproveitar o browser compartilhado quando fornecido; caso contrário abrir um próprio
+            shared_crawler = crawler is not None
+            crawler_context = contextlib.nullcontext(
+                crawler) if shared_crawler else AsyncWebCrawler(config=browser_config)
+
+            # Modificar o crawler para interceptar solicitações ao browser
+            async with crawler_context as crawler:
+                # Adicionar o filtro de URLs ao crawler (apenas se o browser for exclusivo
+                # desta empresa, para não sobrescrever o filtro das demais)
+                if not shared_crawler:
+                    if nome_empresa == "ceitec" and use_simplified:
+                        # Para CEITEC, desativamos o filtro de URL completamente, como no script original
+                        crawler.url_filter = None
+                        logger.info(
+                            f"Desativando filtro de URL para {nome_empresa}")
                     else:
-                        for link in result.links:
-                            content += f"- {link}\n"
+                        # Para outras empresas, usar o filtro normal
+                        crawler.url_filter = should_process_url
+
+                # Conectar ao banco de dados
+                conn = await asyncio.to_thread(get_db_connection)
+                cur = conn.cursor()
+                # Gravações em andamento; psycopg2 é síncrono, então cada lote é
+                # gravado em uma thread enquanto o crawl continua no event loop.
+                # Há no máximo uma de cada, pois compartilham o cursor, e ambas
+                # são aguardadas no finally antes de o cursor ser fechado
+                page_flush: Optional[asyncio.Future] = None
+                doc_flush: Optional[asyncio.Task] = None
+                try:
+                    def prepare_tabela() -> None:
+                        """
+                        Garante o índice único e o esquema de deduplicação da tabela.
+                        Sem eles nenhuma gravação da empresa funcionaria (ON CONFLICT
+                        (link) e content_hash), então uma falha interrompe a empresa.
+                        """
+                        try:
+                            ensure_link_unique_index(cur, config['tabela'])
+                            conn.commit()
+                        except Exception as e:
+                            conn.rollback()
+                            raise RuntimeError(
+                                f"Não foi possível criar o índice único em {config['tabela']}.link; "
+                                f"processamento de {nome_empresa} interrompido: {str(e)}") from e
+
+                        try:
+                            ensure_content_blob_schema(cur, config['tabela'])
+                            conn.commit()
+                        except Exception as e:
+                            conn.rollback()
+                            raise RuntimeError(
+                                f"Não foi possível preparar a deduplicação de conteúdo em {config['tabela']}; "
+                                f"processamento de {nome_empresa} interrompido: {str(e)}") from e
+
+                    # DDL pode esperar por locks da tabela: executar fora do loop de eventos
+                    await asyncio.to_thread(prepare_tabela)
+
+                    novas_paginas = 0
+                    atualizadas = 0
+                    total_paginas = 0
+
+                    # Linhas (content, link, images, tags, local_path) para o upsert em lote;
+                    # o content_hash é acrescentado na gravação por dedup_page_contents
+                    page_rows = []
+                    # Carga inicial (tabela sem links) também usa COPY automaticamente
+                    carga_inicial = existing_urls is not None and len(existing_urls) == 0
+                    if carga_inicial and not bulk:
+                        logger.info(
+                            f"Tabela {config['tabela']} vazia: gravando páginas via COPY")
+                    salvar_paginas = copy_paginas if bulk or carga_inicial else upsert_paginas
+
+                    def write_page_rows(rows: List[Tuple]) -> Tuple[int, int]:
+                        """Grava um lote de páginas no banco em um único comando."""
+                        try:
+                            result = salvar_paginas(
+                                cur, config['tabela'], dedup_page_contents(cur, config['tabela'], rows))
+                            conn.commit()
+                            return result
+                        except Exception:
+                            conn.rollback()
+                            raise
+
+                    async def wait_page_flush() -> None:
+                        """Aguarda a gravação em andamento e contabiliza o resultado."""
+                        nonlocal page_flush, novas_paginas, atualizadas
+                        if page_flush is None:
+                            return
+                        try:
+                            novas, atualizadas_lote = await page_flush
+                            novas_paginas += novas
+                            atualizadas += atualizadas_lote
+                        except Exception as e:
+                            logger.error(f"Erro ao salvar páginas no banco: {str(e)}")
+                        page_flush = None
+
+                    async def flush_page_rows() -> None:
+                        """
+                        Envia as páginas acumuladas para gravação sem bloquear o crawl.
+                        Só um lote fica em andamento por vez, pois a conexão não aceita
+                        comandos concorrentes.
+                        """
+                        nonlocal page_rows, page_flush
+                        await wait_page_flush()
+                        if not page_rows:
+                            return
+                        rows, page_rows = page_rows, []
+                        page_flush = asyncio.ensure_future(
+                            asyncio.to_thread(write_page_rows, rows))
+
+                    loop = asyncio.get_running_loop()
+
+                    # Executar o crawler para páginas HTML, processando cada resultado
+                    # assim que ele chega (stream=True no CrawlerRunConfig)
+                    async for result in await crawler.arun(config["url"], config=run_config):
+                        total_paginas += 1
+
+                        if not result.success:
+                            logger.error(
+                                f"Falha ao crawlear {result.url}: {result.error_message}")
+                            continue
 
-                # Salvar o conteúdo HTML original
-                html_content = ""
-                if hasattr(result, 'html'):
-                    html_content = result.html
-                else:
-                    # Fallback caso não tenha HTML
-                    html_content = f"<html><head><title>{getattr(result, 'title', 'Sem título')}</title></head><body>"
-                    if hasattr(result, 'cleaned_html'):
-                        html_content += result.cleaned_html
-                    elif hasattr(result, 'text'):
-                        html_content += f"<pre>{result.text}</pre>"
-                    else:
-                        html_content += "<p>Sem conteúdo disponível</p>"
-                    html_content += "</body></html>"
+                        page_links = getattr(result, 'links', None)
+                        page_html = getattr(result, 'html', None)
+
+                        # Verificar links na página para encontrar documentos adicionais
+                        if page_links:
+                            # Extrair links de documentos da estrutura de links
+                            if isinstance(page_links, dict):
+                                # Confirmar de uma vez os links da página já gravados
+                                await confirmar_existentes(
+                                    item.get("href") for key in ("internal", "external")
+                                    for item in page_links.get(key, ()) if isinstance(item, dict))
+                                # Adicionar links para documentos à lista
+                                for key in ("internal", "external"):
+                                    for item in page_links.get(key, ()):
+                                        link = item.get("href") if isinstance(item, dict) else None
+                                        if link and is_document_url(link) and link not in document_urls and not ja_processada(link):
+                                            document_urls[link] = None
+                                            logger.info(f"Documento encontrado: {link}")
+
+                        # Markdown, tags, varredura do HTML bruto e gravação do HTML
+                        # rodam no pool de processos, liberando o event loop para o crawl
+                        content, images, tags_array, raw_links, html_path = await loop.run_in_executor(
+                            page_pool, build_page_record, result.url, get_markdown_text(result),
+                            getattr(result, 'title', None), getattr(result, 'text', None),
+                            getattr(result, 'cleaned_html', None), getattr(result, 'media', None),
+                            page_links, page_html, nome_empresa)
+
+                        await confirmar_existentes(raw_links)
+                        for link in raw_links:
+                            if link and is_document_url(link) and link not in document_urls and not ja_processada(link):
+                                document_urls[link] = None
+                                logger.info(
+                                    f"Documento encontrado (via HTML): {link}")
 
-                # Salvar o HTML
-                html_path = save_html_content(
-                    result.url, html_content, nome_empresa)
-                logger.info(f"Conteúdo HTML salvo em: {html_path}")
+                        logger.info(f"Conteúdo HTML salvo em: {html_path}")
 
-                # Extrair tags do caminho da URL
-                tags = extract_path_tags(result.url)
+                        page_rows.append(
+                            (content, result.url, images if images else None, tags_array, html_path))
 
-                # Se não houver tags do caminho, usar subdomínio
-                if not tags:
-                    subdomain = extract_subdomain(result.url)
-                    if subdomain and subdomain != 'www':
-                        tags.append(subdomain)
+                        # Registrar URL processada no cache
+                        crawled_urls.add(result.url)
+                        if url_cache is not None:
+                            url_cache.add(result.url)
 
-                # Remover tags vazias e converter para array PostgreSQL
-                tags = [tag for tag in tags if tag]
-                tags_array = tags if tags else None
+                        if len(page_rows) >= PAGE_BATCH_SIZE:
+                            await flush_page_rows()
 
-                # Inserir ou atualizar no banco
-                try:
-                    # Verificar se o link já existe no banco de dados
-                    cur.execute(
-                        f"SELECT id FROM {config['tabela']} WHERE link = %s", (result.url,))
-                    existing_record = cur.fetchone()
-
-                    if existing_record:
-                        # Update - esta parte só será executada se force_update=True,
-                        # caso contrário a URL seria filtrada antes
-                        cur.execute(f"""
-                            UPDATE {config['tabela']} 
-                            SET content = %s,
-                                images = %s,
-                                tags = %s,
-                                dt_download = CURRENT_TIMESTAMP,
-                                local_path = %s
-                            WHERE link = %s
-                        """, (content, images if images else None, tags_array, html_path, result.url))
-                        atualizadas += 1
-                    else:
-                        # Insert - para páginas novas
-                        cur.execute(f"""
-                            INSERT INTO {config['tabela']} (content, link, images, tags, local_path)
-                            VALUES (%s, %s, %s, %s, %s)
-                        """, (content, result.url, images if images else None, tags_array, html_path))
-                        novas_paginas += 1
-
-                    conn.commit()
-                except Exception as e:
-                    logger.error(f"Erro ao salvar no banco: {str(e)}")
-                    conn.rollback()
+                    # Gravar as páginas restantes
+                    await flush_page_rows()
+                    await wait_page_flush()
 
-            # Processar documentos encontrados
-            logger.info(
-                f"Processando {len(document_urls)} documentos encontrados para {nome_empresa}...")
-            documentos_baixados = 0
-            documentos_falhos = 0
-            documentos_extraidos = 0
-
-            # Adicionar contador para monitoramento de progresso
-            # Reportar a cada 10% aprox.
-            progress_interval = max(1, len(document_urls) // 10)
-
-            # Criar chunks de URLs de documentos para processar em paralelo
-            chunk_size = 3  # Processar menos documentos por vez para melhor controle
-
-            # Criar diretório temporário para extração
-            script_dir = os.path.dirname(os.path.abspath(__file__))
-            project_dir = os.path.dirname(script_dir)
-            temp_extract_dir = os.path.join(
-                get_output_dir(nome_empresa), 'temp_extracted')
-            os.makedirs(temp_extract_dir, exist_ok=True)
-
-            # Criar chunks de URLs de documentos para processar em paralelo
-            for i in range(0, len(document_urls), chunk_size):
-                # Mostrar progresso
-                if i % progress_interval == 0 or i + chunk_size >= len(document_urls):
                     logger.info(
-                        f"Progresso de download: {i}/{len(document_urls)} documentos ({int(i/len(document_urls)*100 if document_urls else 0)}%)")
+                        f"Crawled {total_paginas} páginas HTML para {nome_empresa}")
+                    logger.info(
+                        f"Páginas salvas no banco para {nome_empresa}: {novas_paginas} novas, {atualizadas} atualizadas")
 
-                chunk = document_urls[i:i+chunk_size]
-                download_tasks = []
+                    # Processar documentos encontrados
+                    logger.info(
+                        f"Processando {len(document_urls)} documentos encontrados para {nome_empresa}...")
+                    documentos_baixados = 0
+                    documentos_falhos = 0
+                    documentos_extraidos = 0
+
+                    # Selecionar os documentos que precisam ser baixados, consultando
+                    # no banco de uma só vez os que já foram processados anteriormente
+                    pending_urls = list(document_urls)
+                    if not force_update and pending_urls:
+                        def fetch_ja_salvos() -> Set[str]:
+                            """Retorna os documentos pendentes que já estão no banco."""
+                            cur.execute(
+                                f"SELECT link FROM {config['tabela']} WHERE link = ANY(%s)", (pending_urls,))
+                            ja_salvos = {link for (link,) in cur.fetchall()}
+                            conn.rollback()
+                            return ja_salvos
+
+                        ja_salvos = await asyncio.to_thread(fetch_ja_salvos)
+                        pending_urls = [
+                            doc_url for doc_url in pending_urls if doc_url not in ja_salvos]
+
+                    # Adicionar contador para monitoramento de progresso
+                    # Reportar a cada 10% aprox.
+                    progress_interval = max(1, len(pending_urls) // 10)
+                    concluidos = 0
+
+                    # Cache de ETag/Last-Modified para requisições condicionais
+                    document_cache = open_document_cache(nome_empresa)
+
+                    # Limitar o número de downloads simultâneos; as conexões são
+                    # reaproveitadas pelo pool do connector da sessão
+                    download_semaphore = asyncio.Semaphore(max_downloads)
+
+                    async def bounded_download(doc_url: str) -> Tuple[str, Any]:
+                        """Baixa um documento; devolve a URL com o resultado ou a exceção."""
+                        nonlocal concluidos
+                        async with download_semaphore:
+                            try:
+                                return doc_url, await download_document(doc_url, nome_empresa, session, document_cache)
+                            except Exception as e:
+                                return doc_url, e
+                            finally:
+                                concluidos += 1
+                                # Mostrar progresso
+                                if concluidos % progress_interval == 0 or concluidos == len(pending_urls):
+                                    logger.info(
+                                        f"Progresso de download: {concluidos}/{len(pending_urls)} documentos ({int(concluidos/len(pending_urls)*100)}%)")
 
-                for doc_url in chunk:
-                    # Verificar se o documento já foi processado anteriormente e não estamos forçando atualização
-                    if not force_update:
-                        cur.execute(
-                            f"SELECT id FROM {config['tabela']} WHERE link = %s", (doc_url,))
-                        if cur.fetchone():
-                            continue
+                    logger.info(
+                        f"Baixando {len(pending_urls)} documentos com até {max_downloads} downloads simultâneos")
+                    download_tasks = [asyncio.ensure_future(bounded_download(doc_url))
+                                      for doc_url in pending_urls]
+
+                    # Documentos baixados aguardando gravação:
+                    # (linha, caminho local, tipo, alterado)
+                    doc_batch: List[Tuple[Tuple, str, str, bool]] = []
+
+                    def write_documentos(rows: List[Tuple]) -> None:
+                        """Grava um lote de documentos no banco em uma transação."""
+                        try:
+                            upsert_documentos(cur, config['tabela'], rows)
+                            conn.commit()
+                        except Exception:
+                            conn.rollback()
+                            raise
+
+                    def read_zips_extraidos(links: List[str]) -> Set[str]:
+                        """Consulta os ZIPs do lote que já têm arquivos extraídos."""
+                        try:
+                            return get_zips_extraidos(cur, config['tabela'], links)
+                        finally:
+                            conn.rollback()
+
+                    def write_extraidos(rows: List[Tuple]) -> None:
+                        """Grava os arquivos extraídos de um lote de ZIPs em uma transação."""
+                        try:
+                            copy_arquivos_extraidos(cur, config['tabela'], rows)
+                            conn.commit()
+                        except Exception:
+                            conn.rollback()
+                            raise
+
+                    async def save_documentos(batch: List[Tuple[Tuple, str, str, bool]]) -> None:
+                        """Grava o lote de documentos em uma transação e extrai os ZIPs."""
+                        nonlocal documentos_baixados, documentos_falhos, documentos_extraidos
+                        # psycopg2 é síncrono: gravar em thread enquanto os downloads seguem
+                        try:
+                            await asyncio.to_thread(
+                                write_documentos, [row for row, _, _, _ in batch])
+                        except Exception as e:
+                            logger.error(
+                                f"Erro ao salvar documentos no banco: {str(e)}")
+                            documentos_falhos += len(batch)
+                            return
+
+                        documentos_baixados += len(batch)
+
+                        # ZIPs inalterados só são extraídos se o link ainda não tiver
+                        # arquivos extraídos no banco
+                        zips = [row[1] for row, local_path, file_type, alterado in batch
+                                if not alterado and (file_type == 'zip' or local_path.lower().endswith('.zip'))]
+                        ja_extraidos: Set[str] = set()
+                        if zips:
+                            try:
+                                ja_extraidos = await asyncio.to_thread(read_zips_extraidos, zips)
+                            except Exception as e:
+                                logger.error(
+                                    f"Erro ao consultar ZIPs já extraídos: {str(e)}")
 
-                    # Criar task para download
-                    download_tasks.append(download_document(
-                        doc_url, nome_empresa, session))
+                        extraidos: List[Tuple] = []
+                        for (_, doc_url, rel_path, _), local_path, file_type, alterado in batch:
+                            if url_cache is not None:
+                                url_cache.add(doc_url, 'documento')
+                            logger.info(
+                                f"Documento salvo: {doc_url} -> {rel_path}")
 
-                # Executar os downloads em paralelo com timeout global
-                if download_tasks:
-                    try:
-                        # Adicionar timeout global para o gather
-                        download_results = await asyncio.wait_for(
-                            asyncio.gather(*download_tasks,
-                                           return_exceptions=True),
-                            timeout=DOWNLOAD_TIMEOUT * 2  # Dar tempo extra para o conjunto de downloads
-                        )
-
-                        # Processar resultados dos downloads
-                        for idx, result in enumerate(download_results):
-                            if idx >= len(chunk):  # Verificação de segurança
-                                continue
+                            # Se for um arquivo ZIP, extrair seu conteúdo
+                            if ((file_type == 'zip' or local_path.lower().endswith('.zip'))
+                                    and (alterado or doc_url not in ja_extraidos)):
+                                extraidos.extend(await extract_zip_file(
+                                    local_path, nome_empresa, doc_url))
 
-                            doc_url = chunk[idx]
+                        # Arquivos extraídos de todos os ZIPs do lote em um só COPY e commit
+                        if extraidos:
+                            try:
+                                await asyncio.to_thread(write_extraidos, extraidos)
+                                documentos_extraidos += len(extraidos)
+                                logger.info(
+                                    f"{len(extraidos)} arquivos extraídos salvos no banco")
+                            except Exception as e:
+                                logger.error(
+                                    f"Erro ao salvar arquivos extraídos no banco: {str(e)}")
+
+                    async def wait_doc_flush() -> None:
+                        """Aguarda a gravação de documentos em andamento, se houver."""
+                        nonlocal doc_flush
+                        if doc_flush is not None:
+                            await doc_flush
+                            doc_flush = None
+
+                    async def flush_documentos() -> None:
+                        """
+                        Envia o lote de documentos para gravação em segundo plano; só
+                        espera quando a gravação anterior ainda não terminou.
+                        """
+                        nonlocal doc_flush
+                        await wait_doc_flush()
+                        if not doc_batch:
+                            return
+                        batch = doc_batch[:]
+                        doc_batch.clear()
+                        doc_flush = asyncio.ensure_future(save_documentos(batch))
+
+                    # Processar cada download assim que termina, enquanto os demais seguem
+                    try:
+                        for next_download in asyncio.as_completed(download_tasks):
+                            doc_url, result = await next_download
 
                             # Verificar se ocorreu uma exceção
                             if isinstance(result, Exception):
@@ -1574,7 +3203,7 @@ async def process_empresa(nome_empresa: str, force_update: bool = False, skip_br
                                 documentos_falhos += 1
                                 continue
 
-                            success, local_path, file_type = result
+                            success, local_path, file_type, alterado = result
 
                             if not success:
                                 logger.error(
@@ -1599,101 +3228,66 @@ async def process_empresa(nome_empresa: str, force_update: bool = False, skip_br
                                 doc_tags.append('transparencia')
 
                             # Caminho relativo para armazenar no banco de dados
-                            script_dir = os.path.dirname(
-                                os.path.abspath(__file__))
-                            project_dir = os.path.dirname(script_dir)
-                            rel_path = os.path.relpath(local_path, project_dir)
+                            rel_path = get_project_relpath(local_path)
 
                             # Obter nome do arquivo para título
                             filename = os.path.basename(local_path)
 
                             # Criar conteúdo markdown com informações sobre o documento
-                            content = f"# Documento: {filename}\n\n"
-                            content += f"**Tipo:** {file_type}\n\n"
-                            content += f"**Link original:** {doc_url}\n\n"
-                            content += f"**Arquivo local:** {rel_path}\n\n"
-
-                            # Inserir ou atualizar no banco
-                            try:
-                                # Verificar se o link já existe
-                                cur.execute(
-                                    f"SELECT id FROM {config['tabela']} WHERE link = %s", (doc_url,))
-                                existing_record = cur.fetchone()
-
-                                if existing_record:
-                                    # Update
-                                    cur.execute(f"""
-                                        UPDATE {config['tabela']} 
-                                        SET content = %s,
-                                            local_path = %s,
-                                            tags = %s,
-                                            dt_download = CURRENT_TIMESTAMP
-                                        WHERE link = %s
-                                    """, (content, rel_path, doc_tags, doc_url))
-                                else:
-                                    # Insert
-                                    cur.execute(f"""
-                                        INSERT INTO {config['tabela']} (content, link, local_path, tags)
-                                        VALUES (%s, %s, %s, %s)
-                                    """, (content, doc_url, rel_path, doc_tags))
-
-                                conn.commit()
-                                documentos_baixados += 1
-                                logger.info(
-                                    f"Documento salvo: {doc_url} -> {rel_path}")
-
-                                # Se for um arquivo ZIP, extrair seu conteúdo
-                                if file_type == 'zip' or local_path.lower().endswith('.zip'):
-                                    try:
-                                        # Criar diretório específico para este ZIP
-                                        zip_extract_dir = os.path.join(
-                                            temp_extract_dir, os.path.splitext(filename)[0])
-                                        os.makedirs(
-                                            zip_extract_dir, exist_ok=True)
-
-                                        # Extrair o arquivo ZIP
-                                        extracted_files = await extract_zip_file(
-                                            local_path,
-                                            zip_extract_dir,
-                                            nome_empresa,
-                                            cur,
-                                            config['tabela'],
-                                            doc_url
-                                        )
-
-                                        # Commit para salvar os arquivos extraídos
-                                        conn.commit()
-                                        documentos_extraidos += len(
-                                            extracted_files)
-                                    except Exception as e:
-                                        logger.error(
-                                            f"Erro ao extrair ZIP {filename}: {str(e)}")
-
-                            except Exception as e:
-                                logger.error(
-                                    f"Erro ao salvar documento no banco: {str(e)}")
-                                conn.rollback()
-                    except asyncio.TimeoutError:
-                        logger.error(
-                            f"Timeout global ao processar batch de downloads")
-                    except Exception as e:
-                        logger.error(
-                            f"Erro ao processar batch de downloads: {str(e)}")
-
-                # Adicionar pequena pausa entre batches para evitar sobrecarga
-                await asyncio.sleep(0.5)
+                            content = (
+                                f"# Documento: {filename}\n\n"
+                                f"**Tipo:** {file_type}\n\n"
+                                f"**Link original:** {doc_url}\n\n"
+                                f"**Arquivo local:** {rel_path}\n\n"
+                            )
+
+                            doc_batch.append(
+                                ((content, doc_url, rel_path, doc_tags), local_path, file_type, alterado))
+                            if len(doc_batch) >= DOCUMENT_BATCH_SIZE:
+                                await flush_documentos()
+                    finally:
+                        # Em caso de erro, não deixar downloads usando o cache fechado
+                        for task in download_tasks:
+                            task.cancel()
+                        document_cache.close()
+
+                    # Gravar os documentos restantes
+                    await flush_documentos()
+                    await wait_doc_flush()
+                finally:
+                    pendentes = [f for f in (page_flush, doc_flush) if f is not None]
+                    if pendentes:
+                        await asyncio.gather(*pendentes, return_exceptions=True)
+                    cur.close()
+                    release_db_connection(conn)
+    finally:
+        # Liberar o cache local e a conexão das confirmações também em caso de erro
+        if url_cache is not None:
+            url_cache.close()
+        if existing_urls is not None:
+            existing_urls.close()
 
-        # ...existing code...
 
 # =============================================================================
 # FUNÇÃO PRINCIPAL E PONTO DE ENTRADA
 # =============================================================================
 
 
+def exception_handler(loop, context):
+    """Registra no log exceções não tratadas do event loop."""
+    exception = context.get('exception')
+    logger.error(f"Exceção não tratada: {context['message']}")
+    if exception:
+        logger.error(f"Detalhes: {str(exception)}")
+
+
 async def main():
     # Declaração global deve vir antes de qualquer uso da variável
     global DOWNLOAD_TIMEOUT
 
+    # Configurar tratamento de exceções não tratadas no loop criado por asyncio.run
+    asyncio.get_running_loop().set_exception_handler(exception_handler)
+
     parser = argparse.ArgumentParser(
         description='Crawler incremental para empresas')
     parser.add_argument('--empresas', nargs='+', choices=list(EMPRESAS.keys()) + ['todas'],
@@ -1705,27 +3299,20 @@ async def main():
     parser.add_argument('--skip-browser', action='store_true',
                         help='Pular navegação por browser para arquivos de documentos')
     parser.add_argument('--no-ssl-verify', action='store_true',
-                        help='Desabilitar verificação de certificados SSL')
+                        help='Mantida por compatibilidade: a verificação de certificados SSL já é sempre desabilitada')
     parser.add_argument('--no-cache', action='store_true',
                         help='Desabilitar uso de cache para URLs já processadas')
     parser.add_argument('--timeout', type=int, default=DOWNLOAD_TIMEOUT,
                         help=f'Timeout em segundos para downloads (padrão: {DOWNLOAD_TIMEOUT})')
+    parser.add_argument('--bulk', action='store_true',
+                        help='Gravar páginas via COPY (recomendado para a carga inicial)')
+    parser.add_argument('--max-downloads', type=int, default=MAX_CONCURRENT_DOWNLOADS,
+                        help=f'Número máximo de downloads simultâneos por empresa (padrão: {MAX_CONCURRENT_DOWNLOADS})')
+    parser.add_argument('--max-empresas', type=int, default=MAX_CONCURRENT_EMPRESAS,
+                        help=f'Número máximo de empresas processadas simultaneamente (padrão: {MAX_CONCURRENT_EMPRESAS})')
 
     args = parser.parse_args()
 
-    # Se solicitado, desabilitar verificações SSL
-    if args.no_ssl_verify:
-        import ssl
-        # Criar contexto SSL sem verificação
-        ssl_context = ssl.create_default_context()
-        ssl_context.check_hostname = False
-        ssl_context.verify_mode = ssl.CERT_NONE
-        # Configurar aiohttp para usar este contexto
-        import aiohttp
-        aiohttp.ClientSession._create_connection_params = lambda self, *args, **kwargs: {
-            **kwargs, 'ssl': False
-        }
-
     # Determinar quais empresas processar
     empresas_para_processar = list(
         EMPRESAS.keys()) if 'todas' in args.empresas else args.empresas
@@ -1739,98 +3326,90 @@ async def main():
         logger.info(
             f"Timeout para downloads definido como {DOWNLOAD_TIMEOUT} segundos")
 
-    # Processar as empresas
-    if args.sequential:
-        # Modo sequencial
-        for empresa in empresas_para_processar:
-            await process_empresa(empresa, args.force, skip_browser=args.skip_browser, use_cache=use_cache)
+    # Tabela compartilhada de deduplicação, criada uma única vez antes das
+    # empresas (em paralelo, o CREATE TABLE concorrente poderia falhar)
+    try:
+        await asyncio.to_thread(prepare_content_blob)
+    except Exception as e:
+        logger.error(
+            f"Não foi possível criar a tabela content_blob: {str(e)}")
+        return
+
+    # Pool de processos único para o processamento de CPU das páginas; os
+    # workers vêm do forkserver, e não de fork do processo principal, que a
+    # essa altura já tem threads (Playwright, to_thread) e sockets do libpq
+    with ProcessPoolExecutor(max_workers=os.cpu_count(),
+                             mp_context=multiprocessing.get_context("forkserver")) as page_pool:
+        # Processar as empresas
+        if args.sequential:
+            # Modo sequencial
+            for empresa in empresas_para_processar:
+                # A falha de uma empresa (ex.: tabela sem índice único) não
+                # impede o processamento das seguintes
+                try:
+                    await process_empresa(empresa, args.force, skip_browser=args.skip_browser, use_cache=use_cache, bulk=args.bulk, max_downloads=args.max_downloads, page_pool=page_pool)
+                except Exception as e:
+                    logger.error(
+                        f"Erro no processamento de {empresa.upper()}: {str(e)}")
+                    continue
+                logger.info(
+                    f"Concluído processamento sequencial de {empresa.upper()}")
+        else:
+            # Modo paralelo (processamento assíncrono de todas as empresas)
             logger.info(
-                f"Concluído processamento sequencial de {empresa.upper()}")
-    else:
-        # Modo paralelo (processamento assíncrono de todas as empresas)
-        logger.info(
-            f"Iniciando processamento paralelo de {len(empresas_para_processar)} empresas")
-        tasks = [process_empresa(empresa, args.force, skip_browser=args.skip_browser, use_cache=use_cache)
-                 for empresa in empresas_para_processar]
-        await asyncio.gather(*tasks)
-        logger.info("Concluído processamento paralelo de todas as empresas")
+                f"Iniciando processamento paralelo de {len(empresas_para_processar)} empresas")
+            # Um único browser atende todas as empresas; cada uma usa seu próprio
+            # CrawlerRunConfig, então os crawls continuam independentes
+            # Limitar quantas empresas rodam ao mesmo tempo, já que cada uma
+            # abre seus próprios downloads simultâneos
+            empresa_semaphore = asyncio.Semaphore(max(1, args.max_empresas))
+
+            async def bounded_empresa(empresa: str) -> Tuple[str, Optional[Exception]]:
+                """Processa uma empresa; devolve o nome com a exceção, se houver."""
+                async with empresa_semaphore:
+                    try:
+                        await process_empresa(empresa, args.force, skip_browser=args.skip_browser, use_cache=use_cache, bulk=args.bulk, max_downloads=args.max_downloads, crawler=crawler, page_pool=page_pool)
+                    except Exception as e:
+                        return empresa, e
+                return empresa, None
+
+            async with AsyncWebCrawler(config=BrowserConfig(verbose=True)) as crawler:
+                tasks = [asyncio.ensure_future(bounded_empresa(empresa))
+                         for empresa in empresas_para_processar]
+                # Registrar cada empresa assim que termina; a exceção volta como
+                # resultado, para que a falha de uma empresa não feche o browser
+                # enquanto as demais ainda estão rodando
+                for next_empresa in asyncio.as_completed(tasks):
+                    empresa, erro = await next_empresa
+                    if erro is not None:
+                        logger.error(
+                            f"Erro no processamento de {empresa.upper()}: {str(erro)}")
+                    else:
+                        logger.info(
+                            f"Concluído processamento paralelo de {empresa.upper()}")
+            logger.info("Concluído processamento paralelo de todas as empresas")
 
 if __name__ == "__main__":
     # Certificar-se de que o diretório de dados e saída existe
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    project_dir = os.path.dirname(script_dir)
-    data_dir = os.path.join(project_dir, 'data')
-    output_dir = os.path.join(project_dir, 'output')
-    os.makedirs(data_dir, exist_ok=True)
-    os.makedirs(output_dir, exist_ok=True)
-
-    # Inicializar mimetypes
-    mimetypes.init()
-
-    # Adicionar mapeamentos para extensões comuns que possam faltar
-    mimetypes.add_type('application/pdf', '.pdf')
-    mimetypes.add_type(
-        'application/vnd.openxmlformats-officedocument.wordprocessingml.document', '.docx')
-    mimetypes.add_type(
-        'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', '.xlsx')
-    mimetypes.add_type(
-        'application/vnd.openxmlformats-officedocument.presentationml.presentation', '.pptx')
-    mimetypes.add_type('application/msword', '.doc')
-    mimetypes.add_type('application/vnd.ms-excel', '.xls')
-    mimetypes.add_type('application/vnd.ms-powerpoint', '.ppt')
-    mimetypes.add_type('text/csv', '.csv')
-    mimetypes.add_type('application/zip', '.zip')
-    mimetypes.add_type('application/x-rar-compressed', '.rar')
-    mimetypes.add_type('application/x-7z-compressed', '.7z')
-    # Adicionar mapas para outros formatos comuns de documentos
-    mimetypes.add_type('application/vnd.ms-outlook', '.msg')
-    mimetypes.add_type('application/octet-stream', '.bin')
-    mimetypes.add_type('application/xml', '.xml')
-    mimetypes.add_type('application/json', '.json')
-    mimetypes.add_type('image/jpeg', '.jpg')
-    mimetypes.add_type('image/jpeg', '.jpeg')
-    mimetypes.add_type('image/png', '.png')
-    mimetypes.add_type('image/gif', '.gif')
-    mimetypes.add_type('audio/mpeg', '.mp3')
-    mimetypes.add_type('video/mp4', '.mp4')
-    mimetypes.add_type('audio/wav', '.wav')
+    os.makedirs(os.path.join(PROJECT_DIR, 'data'), exist_ok=True)
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
 
     # Desabilitar verificações SSL definitivamente para todo o script
     import ssl
     ssl._create_default_https_context = ssl._create_unverified_context
 
-    # Reimplementar o monkey patch correto para aiohttp
-    original_aiohttp_TCPConnector = aiohttp.TCPConnector
-
-    class PatchedTCPConnector(original_aiohttp_TCPConnector):
-        def __init__(self, *args, **kwargs):
-            kwargs['verify_ssl'] = False
-            super().__init__(*args, **kwargs)
-
-    # Substituir o conector original pelo nosso conector que sempre desativa SSL
-    aiohttp.TCPConnector = PatchedTCPConnector
-
-    # Também garantir que ClientSession sempre use nosso conector
-    original_ClientSession = aiohttp.ClientSession
-
-    def patched_ClientSession(*args, **kwargs):
-        if 'connector' not in kwargs:
-            kwargs['connector'] = PatchedTCPConnector()
-        return original_ClientSession(*args, **kwargs)
-
-    aiohttp.ClientSession = patched_ClientSession
-
-    # Configurar tratamento de exceções não tratadas
-    def exception_handler(loop, context):
-        exception = context.get('exception')
-        logger.error(f"Exceção não tratada: {context['message']}")
-        if exception:
-            logger.error(f"Detalhes: {str(exception)}")
-
-    # Obter o event loop e configurar handler
-    loop = asyncio.get_event_loop()
-    loop.set_exception_handler(exception_handler)
-
-    # Executar o programa principal
-    loop.run_until_complete(main())
-    loop.close()
+    # Usar o uvloop como event loop quando estiver instalado (mais rápido para
+    # cargas de rede); sem ele, seguir com o loop padrão do asyncio
+    try:
+        import uvloop
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+        logger.info("Usando uvloop como event loop")
+    except ImportError:
+        pass
+
+    # Executar o programa principal; asyncio.run cria o loop pela política ativa
+    # e, ao final, cancela tarefas pendentes e encerra geradores e o executor
+    try:
+        asyncio.run(main())
+    finally:
+        close_db_pool()